@@ -0,0 +1,68 @@
+"""Benchmark finding the distributions that depend on Morepath.
+
+Generates a working set of egg-info distributions in layers, where
+each distribution requires a few distributions of the layer below,
+and computes the distributions that depend on Morepath without a
+cache, with an empty cache (cold) and with a filled cache (warm).
+
+Usage: python benchmarks/dependency_map.py [distributions]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import pkg_resources
+from morepath.autosetup import DependencyMap
+
+
+def generate(root, count, width=20, fan_out=4):
+    random.seed(0)
+    layers = [['morepath']]
+    names = ['morepath']
+    for i in range(count):
+        names.append('dist%d' % i)
+    for i in range(1, len(names), width):
+        layers.append(names[i:i + width])
+    requires = {'morepath': []}
+    for below, layer in zip(layers, layers[1:]):
+        for name in layer:
+            requires[name] = random.sample(below, min(fan_out, len(below)))
+    for name, names in requires.items():
+        egg_info = os.path.join(root, '%s-1.0.egg-info' % name)
+        os.mkdir(egg_info)
+        with open(os.path.join(egg_info, 'PKG-INFO'), 'w') as f:
+            f.write('Metadata-Version: 1.0\nName: %s\nVersion: 1.0\n' % name)
+        with open(os.path.join(egg_info, 'requires.txt'), 'w') as f:
+            f.write('\n'.join(names))
+
+
+def run(root, cache_path):
+    start = time.time()
+    ws = pkg_resources.WorkingSet([root])
+    m = DependencyMap(ws, cache_path)
+    dists = list(m.relevant_dists('morepath'))
+    return time.time() - start, len(dists)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    root = tempfile.mkdtemp()
+    try:
+        dists = os.path.join(root, 'dists')
+        os.mkdir(dists)
+        generate(dists, count)
+        cache_path = os.path.join(root, 'dependencies.json')
+        print('%d distributions' % count)
+        for label, path in [('no cache', None), ('cold', cache_path),
+                            ('warm', cache_path)]:
+            seconds, found = run(dists, path)
+            print('%-10s %.3fs (%d dependents)' % (label, seconds, found))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
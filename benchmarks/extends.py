@@ -0,0 +1,63 @@
+"""Benchmark preparing many configurables extending one large base.
+
+Creates a base configurable with many actions and many configurables
+extending it, each overriding a few actions, and measures the time to
+prepare them and the memory retained by their action maps.
+
+Usage: python benchmarks/extends.py [apps] [actions]
+"""
+import gc
+import resource
+import sys
+import time
+
+from morepath import config
+
+
+class BenchAction(config.Action):
+    def __init__(self, configurable, value):
+        super(BenchAction, self).__init__(configurable)
+        self.value = value
+
+    def identifier(self):
+        return self.value
+
+    def perform(self, configurable, obj):
+        pass
+
+
+def max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    apps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    actions = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    base = config.Configurable()
+    for i in range(actions):
+        base.action(BenchAction(base, i), None)
+    extending = []
+    for i in range(apps):
+        app = config.Configurable(base)
+        for j in range(5):
+            app.action(BenchAction(app, j), None)
+        extending.append(app)
+    gc.collect()
+    rss_before = max_rss()
+    start = time.time()
+    base.prepare()
+    for app in extending:
+        app.prepare()
+    prepare_time = time.time() - start
+    gc.collect()
+    print('%d apps extending a %d action base' % (apps, actions))
+    print('prepare: %.3fs' % prepare_time)
+    print('max RSS growth: %.1f MB' % (max_rss() - rss_before))
+    start = time.time()
+    for app in extending:
+        app._action_map.values()
+    print('resolve all actions: %.3fs' % (time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark committing many apps that extend one large base app.
+
+The base app has a model and a view for each of many model classes;
+each extending app adds a view of its own. Measures commit time, the
+memory growth of the process and request time in an extending app.
+
+Usage: python benchmarks/many_apps.py [apps] [models]
+"""
+import gc
+import resource
+import sys
+import time
+
+import morepath
+from morepath.request import Response
+from werkzeug.test import Client
+
+
+def max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    apps = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    models = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    c = morepath.setup()
+    base = morepath.App('base')
+    c.configurable(base)
+    for i in range(models):
+        model = type('Model%d' % i, (object,), {})
+        c.action(base.model(path='model%d' % i,
+                            variables=lambda m: {}), model)
+        c.action(base.view(model=model), lambda request, model: 'base')
+    extending = []
+    for i in range(apps):
+        app = morepath.App('app%d' % i, extends=[base])
+        c.configurable(app)
+        c.action(app.view(model=model, name='extra'),
+                 lambda request, model: 'extra')
+        extending.append(app)
+    gc.collect()
+    rss_before = max_rss()
+    start = time.time()
+    c.commit()
+    commit_time = time.time() - start
+    gc.collect()
+    print('%d apps extending a base app with %d models' % (apps, models))
+    print('commit: %.3fs' % commit_time)
+    print('max RSS growth: %.1f MB' % (max_rss() - rss_before))
+
+    client = Client(extending[-1], Response)
+    path = '/model%d' % (models - 1)
+    client.get(path)
+    start = time.time()
+    for i in range(1000):
+        client.get(path)
+        client.get(path + '/extra')
+    print('request: %.1f us' % ((time.time() - start) / 2000 * 1e6))
+
+
+if __name__ == '__main__':
+    main()
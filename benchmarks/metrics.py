@@ -0,0 +1,59 @@
+"""Benchmark the overhead of collecting request metrics.
+
+Publishes requests for a trivial view directly through the WSGI
+interface, without and with a :class:`morepath.metrics.Metrics`
+instance set on the app.
+
+Usage: python benchmarks/metrics.py [requests]
+"""
+import sys
+import time
+
+import morepath
+from morepath.metrics import Metrics
+from werkzeug.test import EnvironBuilder
+
+
+def create_app():
+    app = morepath.App('app')
+
+    class Document(object):
+        def __init__(self, id):
+            self.id = id
+
+    c = morepath.setup()
+    c.configurable(app)
+    c.action(app.model(path='documents/{id}',
+                       variables=lambda model: {'id': model.id}), Document)
+    c.action(app.view(model=Document),
+             lambda request, model: 'Document %s' % model.id)
+    c.commit(freeze=True)
+    return app
+
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+
+def run(app, requests):
+    environ = EnvironBuilder('/documents/1').get_environ()
+    for i in range(100):
+        app(environ.copy(), start_response)
+    start = time.time()
+    for i in range(requests):
+        app(environ.copy(), start_response)
+    return (time.time() - start) / requests * 1e6
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    app = create_app()
+    disabled = run(app, requests)
+    app.metrics = Metrics()
+    enabled = run(app, requests)
+    print('metrics disabled: %.1f us per request' % disabled)
+    print('metrics enabled: %.1f us per request' % enabled)
+
+
+if __name__ == '__main__':
+    main()
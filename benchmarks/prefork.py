@@ -0,0 +1,89 @@
+"""Load test the pre-forking server.
+
+Serves a small Morepath app with :class:`morepath.server.PreforkServer`
+using one worker and then the given amount of workers, and requests it
+from several client processes at once. Measures requests per second.
+
+Usage: python benchmarks/prefork.py [workers] [clients] [requests]
+"""
+import httplib
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import morepath
+from morepath.server import PreforkServer, WSGIRequestHandler
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def create_app():
+    app = morepath.App('app')
+
+    class Document(object):
+        def __init__(self, id):
+            self.id = id
+
+    c = morepath.setup()
+    c.configurable(app)
+    c.action(app.model(path='documents/{id}',
+                       variables=lambda model: {'id': model.id}), Document)
+    c.action(app.view(model=Document, render=morepath.render_json),
+             lambda request, model: {'id': model.id,
+                                     'link': request.link(model)})
+    c.commit(freeze=True)
+    return app
+
+
+def client(args):
+    port, requests = args
+    for i in range(requests):
+        conn = httplib.HTTPConnection('127.0.0.1', port)
+        conn.request('GET', '/documents/%d' % i)
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200
+        conn.close()
+
+
+def run(app, workers, clients, requests):
+    server = PreforkServer(app, port=0, workers=workers,
+                           handler_class=QuietHandler)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            server.serve_forever()
+        finally:
+            os._exit(0)
+    server.server.server_close()
+    pool = multiprocessing.Pool(clients)
+    # warm up, also waits for the workers to start
+    pool.map(client, [(server.port, 10)] * clients)
+    start = time.time()
+    pool.map(client, [(server.port, requests)] * clients)
+    elapsed = time.time() - start
+    pool.close()
+    pool.join()
+    os.kill(pid, signal.SIGTERM)
+    os.waitpid(pid, 0)
+    print('%d workers: %.0f requests/s' % (
+        workers, clients * requests / elapsed))
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    requests = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    app = create_app()
+    print('%d clients doing %d requests each' % (clients, requests))
+    run(app, 1, clients, requests)
+    run(app, workers, clients, requests)
+
+
+if __name__ == '__main__':
+    main()
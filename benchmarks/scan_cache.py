@@ -0,0 +1,96 @@
+"""Benchmark cold versus warm scanning with a scan cache.
+
+Generates a package with many modules, only a few of which contain
+Morepath configuration, then scans it in a fresh process without a
+cache, with an empty cache (cold) and with a filled cache (warm).
+
+Usage: python benchmarks/scan_cache.py [modules] [configured]
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SCAN = '''
+import sys, time
+sys.path.insert(0, %(root)r)
+start = time.time()
+import morepath
+from morepath.scancache import ScanCache
+config = morepath.setup()
+if %(cache)r:
+    config.scan_cache = ScanCache(%(cache)r)
+import benchpkg
+config.scan(benchpkg)
+config.commit()
+print('%%.3f %%d' %% (time.time() - start, len(config.actions)))
+'''
+
+PLAIN = '''
+import collections, json, decimal
+
+
+class Thing%(i)d(object):
+    def method(self):
+        return %(i)d
+''' + ''.join('\ndef function%d():\n    return %d\n' % (i, i)
+              for i in range(50))
+
+CONFIGURED = '''
+from .app import app
+
+
+class Model%(i)d(object):
+    pass
+
+
+@app.model(model=Model%(i)d, path='model%(i)d')
+def get_model():
+    return Model%(i)d()
+
+
+@app.view(model=Model%(i)d)
+def default(self, request):
+    return 'model %(i)d'
+'''
+
+
+def generate(root, modules, configured):
+    pkg = os.path.join(root, 'benchpkg')
+    os.mkdir(pkg)
+    with open(os.path.join(pkg, '__init__.py'), 'w') as f:
+        f.write('')
+    with open(os.path.join(pkg, 'app.py'), 'w') as f:
+        f.write('import morepath\napp = morepath.App()\n')
+    for i in range(modules):
+        template = CONFIGURED if i < configured else PLAIN
+        with open(os.path.join(pkg, 'mod%d.py' % i), 'w') as f:
+            f.write(template % {'i': i})
+
+
+def run(root, cache):
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCAN % {'root': root, 'cache': cache}])
+    seconds, actions = output.split()
+    return float(seconds), int(actions)
+
+
+def main():
+    modules = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    configured = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    root = tempfile.mkdtemp()
+    try:
+        generate(root, modules, configured)
+        cache = os.path.join(root, 'scan.json')
+        print('%d modules, %d with configuration' % (modules, configured))
+        for label, path in [('no cache', None), ('cold', cache),
+                            ('warm', cache)]:
+            seconds, actions = run(root, path)
+            print('%-10s %.3fs (%d actions)' % (label, seconds, actions))
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
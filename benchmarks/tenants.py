@@ -0,0 +1,92 @@
+"""Benchmark an app mounted for many tenants.
+
+One app is mounted on ``{tenant}`` in a root app. The context factory
+simulates loading tenant configuration from storage. Every tenant is
+requested twice, without a pool, with a
+:class:`morepath.model.MountPool` only, and with a pool and a
+:class:`morepath.model.MountContextCache`. Each mode runs in its own
+process. Measures request time, context factory calls and the memory
+growth of the process.
+
+Usage: python benchmarks/tenants.py [tenants]
+"""
+import gc
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import morepath
+from morepath.model import MountContextCache, MountPool
+from morepath.request import Response
+from werkzeug.test import Client
+
+
+STORAGE = json.dumps({'name': 'tenant', 'settings': list(range(100))})
+
+
+def max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run(tenants, mode):
+    calls = []
+
+    def get_context(tenant):
+        calls.append(tenant)
+        context = json.loads(STORAGE)
+        context['tenant'] = tenant
+        return context
+
+    class Root(object):
+        pass
+
+    root = morepath.App('root')
+    tenant_app = morepath.App('tenant')
+    c = morepath.setup()
+    c.configurable(root)
+    c.configurable(tenant_app)
+    if mode == 'pooled':
+        mount = root.mount(path='{tenant}', app=tenant_app,
+                           pool=MountPool(tenants))
+    elif mode == 'pooled and cached':
+        mount = root.mount(path='{tenant}', app=tenant_app,
+                           pool=MountPool(tenants),
+                           cache=MountContextCache(tenants))
+    else:
+        mount = root.mount(path='{tenant}', app=tenant_app)
+    c.action(mount, get_context)
+    c.action(tenant_app.root(), Root)
+    c.action(tenant_app.view(model=Root),
+             lambda request, model: request.link(model))
+    c.commit(freeze=True)
+
+    client = Client(root, Response)
+    gc.collect()
+    rss_before = max_rss()
+    times = []
+    for i in range(2):
+        start = time.time()
+        for tenant in range(tenants):
+            client.get('/t%d' % tenant)
+        times.append((time.time() - start) / tenants * 1e6)
+    gc.collect()
+    print('%s: cold %.1f us, warm %.1f us per request, '
+          '%d context loads, max RSS growth %.1f MB' % (
+              mode, times[0], times[1],
+              len(calls), max_rss() - rss_before))
+
+
+def main():
+    tenants = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print('%d tenants' % tenants)
+    for mode in ['default', 'pooled', 'pooled and cached']:
+        # a process per mode, as the maximum RSS only grows
+        process = multiprocessing.Process(target=run, args=(tenants, mode))
+        process.start()
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
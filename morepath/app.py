@@ -1,8 +1,13 @@
-from .publish import publish, Mount
+from .publish import publish, pinned_state, Mount
 from .request import Request
+from .server import PreforkServer
 from .traject import Traject
 from .config import Configurable
-from reg import ClassRegistry, Lookup, CachingClassLookup
+from .error import ConfigError
+from .lookupcache import LRUClassLookup
+from reg import ClassRegistry, Lookup
+from repoze.lru import LRUCache
+from reg.mapping import ClassMultiMapKey
 import venusian
 from werkzeug.serving import run_simple
 
@@ -20,7 +25,41 @@ class AppBase(Configurable, ClassRegistry):
 
     AppBase can be used as a WSGI application, i.e. it can be called
     with ``environ`` and ``start_response`` arguments.
+
+    An app does not repeat the registrations of the apps it extends.
+    Only its own configuration actions are performed on it; lookups
+    in its registry and its traject fall back on those of the apps it
+    extends, in order.
+    """
+    metrics = None
+    """:class:`morepath.metrics.Metrics` to collect request metrics in.
+
+    ``None`` by default, which means no metrics are collected.
+    """
+
+    profiler = None
+    """:class:`morepath.profiler.Profiler` to profile requests with.
+
+    ``None`` by default, which means no requests are profiled.
+    """
+
+    lookup_cache_size = 1000
+    """Maximum amount of cached lookup results per generic function.
+
+    See :class:`morepath.lookupcache.LRUClassLookup`.
     """
+
+    frozen = False
+    """``True`` if the app is frozen using :meth:`freeze`.
+    """
+
+    state = None
+    """The committed :class:`AppState` that requests are served with.
+
+    Replaced atomically at the end of each :meth:`Config.commit`.
+    ``None`` if the app was never committed.
+    """
+
     # XXX have a way to define parameters for app here
     def __init__(self, name='', extends=None):
         """
@@ -36,8 +75,10 @@ class AppBase(Configurable, ClassRegistry):
         self.name = name
         self.traject = Traject()
         self._cached_lookup = None
+        self._registries = None
+        self._snapshot_state = None
         # allow being scanned by venusian
-        venusian.attach(self, callback)
+        self.attach_info = venusian.attach(self, callback)
 
     def __repr__(self):
         return '<morepath.App %r>' % self.name
@@ -49,26 +90,146 @@ class AppBase(Configurable, ClassRegistry):
         Configurable.clear(self)
         self.traject = Traject()
         self._cached_lookup = None
+        self.frozen = False
+
+    def register(self, key, classes, component):
+        """Register a component.
+
+        See :meth:`reg.ClassRegistry.register`.
+
+        :raises: :exc:`morepath.error.ConfigError` if the app is frozen.
+        """
+        if self.frozen:
+            raise ConfigError(
+                "Cannot register in frozen app: %r" % self)
+        ClassRegistry.register(self, key, classes, component)
+
+    def perform(self, actions=None, report=None):
+        """Perform the actions configured on this application.
+
+        Actions inherited from extended applications are not performed
+        again; they were performed on the extended applications, and
+        their registrations are found through :meth:`all`.
+
+        :param actions: list of ``(action, obj)`` to perform. Optional;
+          by default all actions configured on this application.
+        :param report: optional :class:`morepath.report.CommitReport`.
+        """
+        self.traject.layers = [app.traject for app in self.extends]
+        self._cached_lookup = None
+        self.frozen = False
+        if actions is None:
+            actions = self._action_map.actions.values()
+        Configurable.perform(self, actions, report)
+
+    def registries(self):
+        """Registries consulted for lookups, in order.
+
+        This app itself followed by the apps it extends, depth first.
+
+        :returns: list of :class:`reg.ClassRegistry` objects.
+        """
+        if self._registries is not None:
+            return self._registries
+        result = []
+        todo = [self]
+        while todo:
+            registry = todo.pop()
+            if registry in result:
+                continue
+            result.append(registry)
+            todo.extend(reversed(getattr(registry, 'extends', [])))
+        self._registries = result
+        return result
+
+    def all(self, key, classes):
+        """Look up all components, by key and classes.
+
+        Registrations in this app are found first, then those in the
+        apps it extends. A registration for a more specific class is
+        found before one for a less specific class, whatever app it is
+        in.
+        """
+        return layered_all([registry._d for registry in self.registries()],
+                           key, classes)
+
+    def snapshot(self, snapshot):
+        """Create the :class:`AppState` for the configuration that was
+        just committed.
+
+        The state is stored in snapshot, and requests that use it use
+        the states in snapshot for the apps mounted in this app.
+
+        :param snapshot: dict with the states of the apps committed
+          together with this one.
+        """
+        self._snapshot_state = snapshot[self] = AppState(self, snapshot)
+
+    def activate(self):
+        """Serve the configuration that was just committed.
+
+        Replaces :attr:`state` by the :class:`AppState` created by
+        :meth:`snapshot`.
+        """
+        state = self._snapshot_state
+        if state is None:
+            state = AppState(self, {})
+        self._snapshot_state = None
+        self.state = state
+
+    def freeze(self):
+        """Prepare the committed configuration for serving requests.
+
+        Fills the lookup cache of the current :attr:`state` for all
+        registered classes, and combines the traject with those of
+        extended apps. The first requests then do not have to do
+        this work.
+
+        After this the app is read-only until it is committed again.
+        """
+        if self.state is None:
+            self.activate()
+        self.state.freeze()
+        self.frozen = True
 
     def lookup(self):
         """Get the :class:`reg.Lookup` for this application.
 
+        Once configuration is committed this is the lookup of the
+        current :attr:`state`.
+
         :returns: a :class:`reg.Lookup` instance.
         """
+        state = self.state
+        if state is not None:
+            return state.lookup
         # XXX use cached property instead?
         if self._cached_lookup is not None:
             return self._cached_lookup
-        self._cached_lookup = result = Lookup(CachingClassLookup(self))
+        self._cached_lookup = result = Lookup(
+            LRUClassLookup(self, self.lookup_cache_size))
         return result
 
-    def request(self, environ):
+    def lookup_cache_info(self):
+        """Statistics of the lookup cache, for monitoring.
+
+        :returns: a dict with a :class:`morepath.lookupcache.CacheInfo`
+          for each generic function looked up since the last commit.
+        """
+        return self.lookup().class_lookup.info()
+
+    def request(self, environ, lookup=None):
         """Create a :class:`Request` given WSGI environment.
 
         :param environ: WSGI environment
+        :param lookup: the lookup to use. Optional; by default
+          :meth:`lookup`.
         :returns: :class:`morepath.Request` instance
         """
         request = Request(environ)
-        request.lookup = self.lookup()
+        if lookup is None:
+            lookup = self.lookup()
+        request.lookup = lookup
         return request
 
     def context(self, **kw):
@@ -91,24 +252,176 @@ class AppBase(Configurable, ClassRegistry):
         return Mount(self, lambda: context, {})
 
     def __call__(self, environ, start_response, context=None):
-        request = self.request(environ)
-        response = publish(request, self.mounted(context))
+        # pin the state for this request; a commit that happens while
+        # it is handled does not affect it
+        request = self.request(environ, self.lookup())
+        mount = self.mounted(context)
+        if self.metrics is not None:
+            if self.profiler is not None:
+                response = self.metrics.publish(request, mount,
+                                                self.profiler.respond)
+            else:
+                response = self.metrics.publish(request, mount)
+        elif self.profiler is not None:
+            response = self.profiler.publish(request, mount)
+        else:
+            response = publish(request, mount)
         return response(environ, start_response)
 
-    def run(self, host=None, port=None, **options):
+    def run(self, host=None, port=None, workers=None, **options):
         """Use Werkzeug WSGI server to run application.
 
         :param host: hostname
         :param port: port
-        :param options: options as for :func:`werkzeug.serving.run_simple`
+        :param workers: if given, run the application in this amount of
+          worker processes using a :class:`morepath.server.PreforkServer`
+          instead. The app is frozen before the workers are forked, so
+          they share its warmed up configuration.
+        :param options: options as for :func:`werkzeug.serving.run_simple`,
+          or for :class:`morepath.server.PreforkServer` if ``workers``
+          is given.
+        :raises: :exc:`morepath.error.ConfigError` if ``workers`` is
+          given and the configuration of the app was never committed.
         """
         if host is None:
             host = '127.0.0.1'
         if port is None:
             port = 5000
+        if workers is not None:
+            if self.state is None:
+                raise ConfigError(
+                    "Commit configuration before running workers: %r" %
+                    self)
+            if not self.frozen:
+                self.freeze()
+            PreforkServer(self, host, port, workers,
+                          **options).serve_forever()
+            return
         run_simple(host, port, self, **options)
 
 
+class AppState(object):
+    """Committed configuration of an app, as served to requests.
+
+    Consists of the registries and traject of the app, and a lookup
+    with its own cache. A commit creates new registries and trajects
+    for the apps it commits, so an existing state is not affected by
+    a commit that happens while it is used.
+
+    Each request pins the state of its app: its ``request.lookup``
+    is the lookup of the state, which refers back to it as
+    ``lookup.state``. The apps mounted in the app are served with the
+    states they got in the same commit, see
+    :func:`morepath.publish.pinned_state`.
+    """
+    def __init__(self, app, states):
+        """
+        :param app: the :class:`AppBase` to take the state of.
+        :param states: dict with the states of the apps committed
+          together with app, by app.
+        """
+        self.app = app
+        self.states = states
+        self.traject = app.traject
+        self.lookup = Lookup(LRUClassLookup(LayeredClassLookup(
+            [registry._d for registry in app.registries()]),
+            app.lookup_cache_size))
+        self.lookup.state = self
+        # paths of mounts in this app, see morepath.core.mount_path
+        self.mount_paths = LRUCache(1000)
+        self.frozen = False
+
+    def freeze(self):
+        """Warm the lookup cache and flatten the traject.
+
+        For each registered key, the lookup cache is filled for the
+        classes it was registered for, and for those with the last
+        class replaced by any registered subclass of it.
+        """
+        if self.frozen:
+            return
+        self.traject = self.traject.flatten()
+        class_lookup = self.lookup.class_lookup
+        registered = {}
+        classes = set()
+        for d in self.lookup.class_lookup.class_lookup.maps:
+            for key, m in d.items():
+                for registered_classes, component in multimap_items(m):
+                    registered.setdefault(key, set()).add(registered_classes)
+                    classes.update(registered_classes)
+        for key, registered_classes in registered.items():
+            to_warm = set(registered_classes)
+            for warm_classes in registered_classes:
+                if not warm_classes:
+                    continue
+                for class_ in classes:
+                    if issubclass(class_, warm_classes[-1]):
+                        to_warm.add(warm_classes[:-1] + (class_,))
+            for warm_classes in to_warm:
+                class_lookup.get(key, warm_classes)
+                class_lookup.all(key, warm_classes)
+        self.frozen = True
+
+
+def multimap_items(m):
+    """Registered class tuples and components in a MultiMap.
+    """
+    for arity, value in m._by_arity.items():
+        if arity == 0:
+            yield (), value
+            continue
+        items = [((), value)]
+        for i in range(arity):
+            items = [(classes + (key.key,), v)
+                     for classes, submap in items
+                     for key, v in dict.items(submap)]
+        for item in items:
+            yield item
+
+
+class LayeredClassLookup(object):
+    """Class lookup over a fixed list of registrations.
+
+    :param maps: list of ``ClassRegistry._d`` dicts, in order of
+      precedence.
+    """
+    def __init__(self, maps):
+        self.maps = maps
+
+    def get(self, key, classes):
+        return next(self.all(key, classes), None)
+
+    def all(self, key, classes):
+        return layered_all(self.maps, key, classes)
+
+
+def layered_all(registrations, key, classes):
+    maps = [d.get(key) for d in registrations]
+    maps = [m for m in maps if m is not None]
+    if not maps:
+        return
+    if len(maps) == 1:
+        for component in maps[0].all(ClassMultiMapKey(*classes)):
+            yield component
+        return
+    for k in ClassMultiMapKey(*classes).ancestors:
+        for m in maps:
+            component = m.exact_get(k)
+            if component is not None:
+                yield component
+
+
+def state_traject(app, lookup=None):
+    """Get the traject of app for use with lookup.
+
+    See :func:`morepath.publish.pinned_state`.
+    """
+    state = pinned_state(app, lookup)
+    if state is None:
+        return app.traject
+    return state.traject
+
+
 class App(AppBase):
     """A Morepath-based application object.
 
@@ -140,7 +453,7 @@ class App(AppBase):
             extends = [global_app]
         super(App, self).__init__(name, extends)
         # XXX why does this need to be repeated?
-        venusian.attach(self, callback)
+        self.attach_info = venusian.attach(self, callback)
 
 
 def callback(scanner, name, obj):
@@ -1,9 +1,22 @@
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
 import pkg_resources
-from pkgutil import walk_packages
+import pkgutil
+import py_compile
+import sys
+from collections import deque
 from morepath.core import setup
 
 
-def autoconfig(ignore=None):
+log = logging.getLogger(__name__)
+
+
+def autoconfig(ignore=None, scan_cache=None, dependency_cache=None,
+               processes=None):
     """Automatically load Morepath configuration from packages.
 
     Morepath configuration consists of decorator calls on :class:`App`
@@ -35,17 +48,29 @@ def autoconfig(ignore=None):
 
     :param ignore: Venusian_ style ignore to ignore some modules
       during scanning. Optional.
+    :param scan_cache: a :class:`morepath.scancache.ScanCache` to
+      speed up scanning of packages that did not change. Optional.
+    :param dependency_cache: path of a file to cache which installed
+      distributions depend on Morepath. Optional.
+    :param processes: if given, the number of processes used to
+      compile the Python source files of all packages to bytecode
+      before they are scanned. Scanning itself, and so the order of
+      configuration actions, is unaffected. Optional.
     :returns: :class:`Config` object.
 
     .. _Venusian: http://venusian.readthedocs.org
     """
-    c = setup()
-    for package in morepath_packages():
+    c = setup(scan_cache)
+    packages = list(morepath_packages(dependency_cache))
+    if processes:
+        compile_packages(packages, processes)
+    for package in packages:
         c.scan(package, ignore)
     return c
 
 
-def autosetup(ignore=None):
+def autosetup(ignore=None, scan_cache=None, dependency_cache=None,
+              processes=None):
     """Automatically commit Morepath configuration from packages.
 
     As with :func:`autoconfig`, but also commits
@@ -57,92 +82,302 @@ def autosetup(ignore=None):
 
     :param ignore: Venusian_ style ignore to ignore some modules
       during scanning. Optional.
+    :param scan_cache: a :class:`morepath.scancache.ScanCache` to
+      speed up scanning of packages that did not change. Optional.
+    :param dependency_cache: path of a file to cache which installed
+      distributions depend on Morepath. Optional.
+    :param processes: number of processes to compile bytecode with
+      before scanning. Optional.
     """
-    c = autoconfig(ignore)
+    c = autoconfig(ignore, scan_cache, dependency_cache, processes)
     c.commit()
 
 
 class DependencyMap(object):
-    def __init__(self):
+    """Dependencies between distributions in a working set.
+
+    The distributions that depend on a given distribution, directly
+    or indirectly, are computed once with a breadth-first traversal of
+    the reverse dependency graph.
+
+    This can be cached on disk. The cache is only used if it was
+    written for exactly the same working set: the same distributions,
+    versions and locations.
+    """
+    def __init__(self, working_set=None, cache_path=None):
+        """
+        :param working_set: the ``pkg_resources.WorkingSet`` to use.
+          Optional; by default the global working set.
+        :param cache_path: path of a file to cache dependents in.
+          Optional.
+        """
+        if working_set is None:
+            working_set = pkg_resources.working_set
+        self.working_set = working_set
+        self.cache_path = cache_path
         self._d = {}
         self._dists = {}
+        self._dependents = {}
+        self._loaded = False
+        self._fingerprint = None
 
     def load(self):
-        for dist in pkg_resources.working_set:
+        for dist in self.working_set:
             self._dists[dist.project_name] = dist
             for r in dist.requires():
                 self._d.setdefault(
                     dist.project_name, set()).add(r.project_name)
+        self._loaded = True
+
+    def fingerprint(self):
+        """Fingerprint of the working set.
+
+        :returns: a hex digest of the name, version and location of
+          all distributions.
+        """
+        if self._fingerprint is None:
+            h = hashlib.sha1()
+            for dist in sorted(self.working_set,
+                               key=lambda dist: dist.project_name):
+                h.update(repr((dist.project_name, dist.version,
+                               dist.location)))
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def dependents(self, on_project_name):
+        """Names of projects that depend on a project.
+
+        :param on_project_name: name of the project.
+        :returns: set of project names that directly or indirectly
+          depend on it.
+        """
+        result = self._dependents.get(on_project_name)
+        if result is not None:
+            return result
+        result = self._load_dependents(on_project_name)
+        if result is None:
+            result = self._calculate_dependents(on_project_name)
+            self._save_dependents(on_project_name, result)
+        self._dependents[on_project_name] = result
+        return result
+
+    def _calculate_dependents(self, on_project_name):
+        if not self._loaded:
+            self.load()
+        reverse = {}
+        for project_name, requires in self._d.items():
+            for name in requires:
+                reverse.setdefault(name, []).append(project_name)
+        result = set()
+        todo = deque([on_project_name])
+        while todo:
+            for name in reverse.get(todo.popleft(), []):
+                if name not in result:
+                    result.add(name)
+                    todo.append(name)
+        return result
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        if data.get('fingerprint') != self.fingerprint():
+            return {}
+        return data['dependents']
+
+    def _load_dependents(self, on_project_name):
+        if self.cache_path is None:
+            return None
+        result = self._read_cache().get(on_project_name)
+        if result is None:
+            return None
+        return set(result)
+
+    def _save_dependents(self, on_project_name, result):
+        if self.cache_path is None:
+            return
+        dependents = self._read_cache()
+        dependents[on_project_name] = sorted(result)
+        tmp_path = '%s.%s.tmp' % (self.cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint(),
+                       'dependents': dependents}, f)
+        os.rename(tmp_path, self.cache_path)
 
     def depends(self, project_name, on_project_name):
-        dependent_project_names = self._d.get(project_name, set())
-        if on_project_name in dependent_project_names:
-            return True
-        for n in dependent_project_names:
-            if self.depends(n, on_project_name):
-                return True
-        return False
+        return project_name in self.dependents(on_project_name)
 
     def relevant_dists(self, on_project_name):
-        for dist in pkg_resources.working_set:
-            if not self.depends(dist.project_name, on_project_name):
-                continue
-            yield dist
+        dependents = self.dependents(on_project_name)
+        for dist in self.working_set:
+            if dist.project_name in dependents:
+                yield dist
 
 
 # XXX support for venusian style ignore?
-def morepath_packages():
-    namespace_packages = set()
-    paths = []
-    m = DependencyMap()
-    m.load()
+def morepath_packages(dependency_cache=None):
+    """Import the packages of distributions that depend on Morepath.
+
+    Packages are found using distribution metadata, without importing
+    anything else. A distribution can list the modules or packages to
+    scan explicitly as entry points in the ``morepath`` group; their
+    names are not used::
+
+      entry_points={
+          'morepath': ['scan = mypackage']
+      }
+
+    Otherwise the packages listed in ``top_level.txt`` are used, or
+    if it is missing those in the files recorded as installed by the
+    distribution, or if these are missing too the package with the
+    name of the project. For namespace packages, the packages inside them
+    that are part of the distribution are used instead.
+
+    :param dependency_cache: path of a file to cache which installed
+      distributions depend on Morepath. Optional.
+    :returns: iterable of package modules.
+    """
+    m = DependencyMap(cache_path=dependency_cache)
+    seen = set()
     for dist in m.relevant_dists('morepath'):
-        if dist.has_metadata('namespace_packages.txt'):
-            data = dist.get_metadata('namespace_packages.txt')
-            for ns in data.split('\n'):
-                namespace_packages.add(ns.strip())
-        paths.append(dist.location)
+        for dotted_name in dist_packages(dist):
+            if dotted_name in seen:
+                continue
+            seen.add(dotted_name)
+            yield importlib.import_module(dotted_name)
 
-    seen = set()
 
-    for importer, dotted_name, is_pkg in walk_packages(paths,
-                                                       onerror=skip_error):
+def dist_packages(dist):
+    """Dotted names of the packages in a distribution to scan.
+
+    :param dist: a ``pkg_resources.Distribution``.
+    :returns: iterable of dotted names.
+    """
+    entry_points = dist.get_entry_map('morepath')
+    if entry_points:
+        for name in sorted(entry_points):
+            yield entry_points[name].module_name
+        return
+    namespace_packages = set(metadata_lines(dist, 'namespace_packages.txt'))
+    if dist.has_metadata('top_level.txt'):
+        top_level = metadata_lines(dist, 'top_level.txt')
+    else:
+        top_level = recorded_top_level(dist)
+    if top_level is None:
+        # the location may be shared with other distributions, such as
+        # site-packages, so we don't scan all of it but look for a
+        # package named after the project, as in a develop install
+        top_level = [dist.project_name.replace('-', '_')]
+    found = False
+    for name in top_level:
+        for dotted_name in package_names(dist.location, name,
+                                         namespace_packages):
+            found = True
+            yield dotted_name
+    if not found:
+        log.warning("No packages found for %s, not scanning it", dist)
+
+
+def recorded_top_level(dist):
+    """Names of the top-level packages in the installed files of dist.
+
+    Uses ``RECORD`` for wheel installs and ``installed-files.txt`` for
+    egg-info installs.
+
+    :returns: a sorted list of names, or ``None`` if dist does not
+      record its installed files.
+    """
+    if dist.has_metadata('RECORD'):
+        paths = [line.split(',')[0]
+                 for line in metadata_lines(dist, 'RECORD')]
+    elif (dist.has_metadata('installed-files.txt') and
+          getattr(dist, 'egg_info', None) is not None):
+        paths = [os.path.relpath(os.path.join(dist.egg_info, path),
+                                 dist.location)
+                 for path in metadata_lines(dist, 'installed-files.txt')]
+    else:
+        return None
+    result = set()
+    for path in paths:
+        parts = os.path.normpath(path).split(os.sep)
+        # only files inside a directory can be part of a package
+        if len(parts) > 1 and parts[0] != os.pardir:
+            result.add(parts[0])
+    return sorted(result)
+
+
+def package_names(path, dotted_name, namespace_packages):
+    name = dotted_name.split('.')[-1]
+    importer = pkgutil.get_importer(path)
+    if importer is None:
+        return
+    loader = importer.find_module(name)
+    if loader is None or not loader.is_package(name):
+        return
+    if dotted_name not in namespace_packages:
+        yield dotted_name
+        return
+    sub_path = os.path.join(path, name)
+    for importer, sub_name, is_pkg in pkgutil.iter_modules([sub_path]):
         if not is_pkg:
             continue
-        if dotted_name in namespace_packages:
-            continue
-        if known_prefix(dotted_name, seen):
-            continue
-        for prefix in prefixes(dotted_name):
-            seen.add(prefix)
-        m = importer.find_module(dotted_name).load_module(dotted_name)
-        # XXX hack to work around bug in walk_packages that will load
-        # more than one namespace package
-        # XXX performance
-        if in_path(m, paths):
-            yield m
-
+        for result in package_names(sub_path, dotted_name + '.' + sub_name,
+                                    namespace_packages):
+            yield result
 
-def prefixes(dottedname):
-    parts = dottedname.split('.')
-    for i in range(1, len(parts)):
-        yield '.'.join(parts[:i])
 
+def metadata_lines(dist, name):
+    if not dist.has_metadata(name):
+        return []
+    return list(dist.get_metadata_lines(name))
 
-def known_prefix(dottedname, seen):
-    for prefix in prefixes(dottedname):
-        if prefix in seen:
-            return True
-    return False
 
+def compile_packages(packages, processes):
+    """Compile stale Python source files of packages to bytecode.
 
-def in_path(m, paths):
-    for path in paths:
-        for p in m.__path__:
-            if p.startswith(path):
-                return True
-    return False
+    Python 2 imports modules while holding a global import lock, so
+    importing packages in threads would not run in parallel. The
+    compilation of source to bytecode does, in separate processes, so
+    the imports done while scanning only need to load bytecode.
 
-
-def skip_error(pkg):
-    pass
+    :param packages: package modules.
+    :param processes: number of processes to compile with.
+    """
+    if sys.dont_write_bytecode:
+        return
+    paths = [path for path in source_paths(packages)
+             if bytecode_stale(path)]
+    if not paths:
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        pool.map(compile_source, paths)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def source_paths(packages):
+    for package in packages:
+        for path in getattr(package, '__path__', []):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for filename in filenames:
+                    if filename.endswith('.py'):
+                        yield os.path.join(dirpath, filename)
+
+
+def bytecode_stale(path):
+    try:
+        return os.stat(path + 'c').st_mtime < os.stat(path).st_mtime
+    except OSError:
+        return True
+
+
+def compile_source(path):
+    try:
+        py_compile.compile(path, doraise=True)
+    except (py_compile.PyCompileError, IOError):
+        # reported when the module is imported
+        pass
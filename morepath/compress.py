@@ -0,0 +1,108 @@
+import hashlib
+import zlib
+from repoze.lru import LRUCache
+from werkzeug.http import parse_accept_header
+from .view import accept_quality
+
+
+ENCODINGS = ['gzip', 'deflate']
+
+
+class Compression(object):
+    """Compress responses using gzip or deflate.
+
+    The encoding is negotiated using the ``Accept-Encoding`` header of
+    the request. Only the standard library ``zlib`` module is used.
+
+    The compressed bodies of views marked ``cacheable`` are kept in
+    a bounded cache keyed by a hash of the body, so that repeated
+    responses are not compressed again.
+    """
+    def __init__(self, min_size=500, level=6, cache_size=100):
+        """
+        :param min_size: responses with a body smaller than this amount
+          of bytes are not compressed.
+        :type min_size: int
+        :param level: the zlib compression level, from 1 to 9.
+        :type level: int
+        :param cache_size: the maximum amount of compressed bodies to
+          cache for cacheable views.
+        :type cache_size: int
+        """
+        self.min_size = min_size
+        self.level = level
+        self.cache = LRUCache(cache_size)
+
+    def compress(self, request, response, cacheable=False):
+        """Compress response if the client accepts it.
+
+        :param request: the request the response is for.
+        :type request: :class:`morepath.Request`
+        :param response: the response to compress.
+        :type response: :class:`morepath.Response`
+        :param cacheable: if true, the compressed body is cached.
+        :returns: the response, compressed if possible.
+        """
+        if response.is_streamed or 'Content-Encoding' in response.headers:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        if cacheable:
+            key = (encoding, hashlib.sha1(body).digest())
+            compressed = self.cache.get(key)
+            if compressed is None:
+                compressed = compress_body(body, encoding, self.level)
+                self.cache.put(key, compressed)
+        else:
+            compressed = compress_body(body, encoding, self.level)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def negotiate_encoding(accept_encoding):
+    """Negotiate the encoding for an ``Accept-Encoding`` header.
+
+    Encodings the client refuses with a quality of 0 are not used. The
+    response is not compressed if the client prefers ``identity``.
+
+    :param accept_encoding: the value of the ``Accept-Encoding``
+      header, or ``None``.
+    :returns: the best encoding in ``ENCODINGS``, or ``None`` if the
+      response should not be compressed.
+    """
+    if not accept_encoding:
+        return None
+    accept = parse_accept_header(accept_encoding)
+    result = None
+    best_quality = 0
+    for encoding in ENCODINGS:
+        quality = accept_quality(accept, encoding)
+        if quality > best_quality:
+            result = encoding
+            best_quality = quality
+    if result is None:
+        return None
+    # identity is acceptable unless refused explicitly or by *
+    if 'identity' in accept:
+        identity_quality = accept_quality(accept, 'identity')
+    else:
+        identity_quality = 1
+    if identity_quality > best_quality:
+        return None
+    return result
+
+
+def compress_body(body, encoding, level):
+    if encoding == 'gzip':
+        # adding 16 to wbits makes zlib write a gzip header and trailer
+        compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                      16 + zlib.MAX_WBITS)
+    else:
+        compressor = zlib.compressobj(level)
+    return compressor.compress(body) + compressor.flush()
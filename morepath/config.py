@@ -1,4 +1,6 @@
+from contextlib import contextmanager
 from copy import copy
+import time
 import venusian
 from .error import ConflictError
 from .framehack import caller_package
@@ -24,6 +26,7 @@ class Configurable(object):
         if not isinstance(extends, list):
             extends = [extends]
         self.extends = extends
+        self.committed_actions = None
         self.clear()
 
     def clear(self):
@@ -60,7 +63,8 @@ class Configurable(object):
         """
         # check for conflicts and fill action map
         discriminators = {}
-        self._action_map = action_map = {}
+        action_map = {}
+        self._action_map = ActionMap(action_map)
         for action, obj in self._actions:
             id = action.identifier()
             discs = [id]
@@ -83,21 +87,153 @@ class Configurable(object):
         combined with this one. This allows the extending configurable
         to override configuration in extended configurables.
 
+        The actions of the other configurable are not copied; they are
+        consulted after those already in this configurable.
+
         :param configurable: the configurable to combine with this one.
         """
-        to_combine = configurable._action_map.copy()
-        to_combine.update(self._action_map)
-        self._action_map = to_combine
+        self._action_map.layers.append(configurable._action_map)
+
+    def freeze(self):
+        """Optimize activated configuration for use.
+
+        Called for all configurables by :meth:`Config.commit` if
+        ``freeze`` is true. Does nothing by default.
+        """
+
+    def snapshot(self, snapshot):
+        """Prepare to use the configuration that was performed.
+
+        Called for all configurables at the end of a
+        :meth:`Config.commit`, after all have been performed and
+        before any is activated. Does nothing by default.
+
+        :param snapshot: dict shared by the configurables committed
+          together. A configurable can store what it is going to use
+          in it, with itself as the key, so that it can find what the
+          others use.
+        """
+
+    def activate(self):
+        """Start using the configuration that was performed.
+
+        Called for all configurables at the end of a
+        :meth:`Config.commit`, after :meth:`snapshot` was called for
+        all of them. Does nothing by default.
+        """
 
-    def perform(self):
+    def perform(self, actions=None, report=None):
         """Perform actions in this configurable.
 
         Prepare must be called before calling this.
+
+        :param actions: list of ``(action, obj)`` to perform. Optional;
+          by default all actions of this configurable are performed.
+          Used by an incremental :meth:`Config.commit` to perform only
+          added actions.
+        :param report: :class:`morepath.report.CommitReport` to record
+          the time each action takes in. Optional.
         """
-        values = self._action_map.values()
-        values.sort(key=lambda (action, obj): (-action.priority, action.order))
-        for action, obj in values:
+        if actions is None:
+            actions = self._action_map.values()
+        actions = sorted(actions, key=action_sort_key)
+        if report is None:
+            for action, obj in actions:
+                action.perform(self, obj)
+            return
+        report.configurable(self, len(actions))
+        for action, obj in actions:
+            start = time.time()
             action.perform(self, obj)
+            report.action(action, time.time() - start)
+
+
+class ActionMap(object):
+    """Actions by identifier, layered over the actions of other maps.
+
+    An identifier found in an earlier layer overrides the same
+    identifier in later layers. Layers are shared, not copied, so a
+    large configurable extended by many others is stored only once.
+    """
+    def __init__(self, actions, layers=None):
+        """
+        :param actions: dict mapping identifier to ``(action, obj)``.
+        :param layers: list of :class:`ActionMap` to consult, in order,
+          after ``actions``. Optional.
+        """
+        self.actions = actions
+        if layers is None:
+            layers = []
+        self.layers = layers
+
+    def get(self, id, default=None):
+        try:
+            return self[id]
+        except KeyError:
+            return default
+
+    def __getitem__(self, id):
+        result = self.actions.get(id, MISSING)
+        if result is not MISSING:
+            return result
+        for layer in self.layers:
+            result = layer.get(id, MISSING)
+            if result is not MISSING:
+                return result
+        raise KeyError(id)
+
+    def __contains__(self, id):
+        return self.get(id, MISSING) is not MISSING
+
+    def __iter__(self):
+        return (id for id, value in self.items())
+
+    def __len__(self):
+        return sum(1 for id in self)
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [value for id, value in self.items()]
+
+    def items(self):
+        """Iterate over identifier, ``(action, obj)`` pairs.
+
+        Each identifier is produced once, with the value of the
+        first layer it is found in.
+        """
+        return self.flatten().iteritems()
+
+    def flatten(self):
+        """Flatten layers into a new dict.
+
+        :returns: a dict mapping identifier to ``(action, obj)``.
+        """
+        result = {}
+        for actions in reversed(list(self._layer_actions())):
+            result.update(actions)
+        return result
+
+    def _layer_actions(self):
+        # a map seen before is overridden entirely by its earlier
+        # occurrence, so is skipped
+        seen = set()
+        todo = [self]
+        while todo:
+            action_map = todo.pop()
+            if id(action_map) in seen:
+                continue
+            seen.add(id(action_map))
+            yield action_map.actions
+            todo.extend(reversed(action_map.layers))
+
+
+MISSING = object()
+
+
+def action_sort_key((action, obj)):
+    return -action.priority, action.order
 
 
 class Action(object):
@@ -247,10 +383,15 @@ class Config(object):
     :func:`autosetup` which help automatically load configuration from
     dependencies.
     """
-    def __init__(self):
+    def __init__(self, scan_cache=None):
+        """
+        :param scan_cache: optional :class:`morepath.scancache.ScanCache`
+          to speed up scanning of packages that have not changed.
+        """
         self.configurables = []
         self.actions = []
         self.count = 0
+        self.scan_cache = scan_cache
 
     def scan(self, package=None, ignore=None):
         """Scan package for configuration actions (decorators).
@@ -267,7 +408,10 @@ class Config(object):
         if package is None:
             package = caller_package()
         scanner = venusian.Scanner(config=self)
-        scanner.scan(package, ignore=ignore)
+        if self.scan_cache is not None:
+            self.scan_cache.scan(scanner, package, ignore)
+        else:
+            scanner.scan(package, ignore=ignore)
 
     def configurable(self, configurable):
         """Register a configurable with this config.
@@ -314,7 +458,7 @@ class Config(object):
             for prepared, prepared_obj in action.prepare(obj):
                 yield (prepared, prepared_obj)
 
-    def commit(self):
+    def commit(self, incremental=False, report=None, freeze=False):
         """Commit all configuration.
 
         * Clears any previous configuration from all registered
@@ -332,22 +476,221 @@ class Config(object):
         further modified. In tests this method can be executed
         multiple times as it will automatically clear the
         configuration of its configurables first.
+
+        An incremental commit compares the actions of each
+        configurable with those it had after the previous commit, by
+        their identifier and the object they are performed on.
+        Configurables without changes are left alone. If actions were
+        only added to a configurable, and they would be performed
+        after all its existing actions anyway, only those are
+        performed. Registrations cannot be undone, so if an action
+        was removed or changed, that is, it has the same identifier but
+        another object, the configurable is committed again from
+        scratch. Configurables extending a changed configurable are
+        always committed again. The result is the same as that of a
+        full commit.
+
+        A commit can happen while apps serve requests. Committed
+        configuration is built into new registries and trajects, and
+        only replaces what apps serve once the commit is complete.
+        Requests that are in progress finish with the configuration
+        they started with, including that of the apps mounted in
+        their app if these were committed by the same commit. An
+        incremental commit that only adds actions to a configurable
+        adds them in place, so they become visible to requests in
+        progress.
+
+        :param incremental: commit incrementally. Optional; by default
+          all configuration is committed from scratch.
+        :param report: a :class:`morepath.report.CommitReport` to fill
+          in with the time and memory used by the phases of the commit
+          and by each action. Optional.
+        :param freeze: freeze configurables after the commit, see
+          :meth:`morepath.AppBase.freeze`. Optional.
+        """
+        if incremental:
+            with phase(report, 'incremental'):
+                self.commit_incremental(report)
+        else:
+            self.commit_full(report)
+        if freeze:
+            with phase(report, 'freeze'):
+                for configurable in self.configurables:
+                    configurable.freeze()
+
+    def commit_full(self, report=None):
+        """Commit all configuration from scratch.
+
+        See :meth:`commit`.
+
+        :param report: optional :class:`morepath.report.CommitReport`.
         """
+
         # clear all previous configuration; commit can only be run
         # once during runtime so it's handy to clear this out for tests
-        for configurable in self.configurables:
-            configurable.clear()
+        with phase(report, 'clear'):
+            for configurable in self.configurables:
+                configurable.clear()
+
+        with phase(report, 'prepared'):
+            for action, obj in self.prepared():
+                action.configurable.action(action, obj)
+
+        configurables = sort_configurables(self.configurables)
 
-        for action, obj in self.prepared():
-            action.configurable.action(action, obj)
+        # detects conflicts and combines with extended configurables
+        with phase(report, 'prepare'):
+            for configurable in configurables:
+                configurable.prepare()
 
+        with phase(report, 'perform'):
+            for configurable in configurables:
+                configurable.perform(report=report)
+
+        self.record_committed(configurables)
+
+        with phase(report, 'activate'):
+            activate(configurables)
+
+    def commit_incremental(self, report=None):
+        """Commit only configuration that changed since last commit.
+
+        See :meth:`commit`.
+
+        :param report: optional :class:`morepath.report.CommitReport`.
+        """
         configurables = sort_configurables(self.configurables)
+        actions = self.actions_by_configurable()
+
+        changed = set()
+        added = {}
+        for configurable in configurables:
+            new = actions.get(configurable, [])
+            old = configurable.committed_actions
+            if old is not None and action_ids(new) == action_ids(old):
+                if not any(extend in changed
+                           for extend in configurable.extends):
+                    continue
+            elif (old is not None and
+                  action_ids(old) <= action_ids(new) and
+                  not any(extend in changed
+                          for extend in configurable.extends)):
+                old_ids = action_ids(old)
+                added[configurable] = [(action, obj) for action, obj in new
+                                       if action_id(action, obj)
+                                       not in old_ids]
+            changed.add(configurable)
+
+        redo = {}
+        for configurable in configurables:
+            if configurable not in changed:
+                continue
+            prepared = []
+            if configurable in added:
+                prepared = list(prepare_actions(added[configurable]))
+                if not performed_after(configurable, prepared):
+                    del added[configurable]
+            redo[configurable] = prepared
 
         for configurable in configurables:
-            configurable.prepare()
+            if configurable in redo and configurable not in added:
+                configurable.clear()
+                for action, obj in prepare_actions(
+                        actions.get(configurable, [])):
+                    action.configurable.action(action, obj)
+            elif configurable in added:
+                for action, obj in redo[configurable]:
+                    action.configurable.action(action, obj)
 
         for configurable in configurables:
-            configurable.perform()
+            if configurable in redo:
+                configurable.prepare()
+
+        for configurable in configurables:
+            if configurable in added:
+                configurable.perform(redo[configurable], report)
+            elif configurable in redo:
+                configurable.perform(report=report)
+
+        self.record_committed(configurables)
+
+        # unchanged configurables are activated too, so that they
+        # use the same snapshot as those that changed
+        activate(configurables)
+
+    def actions_by_configurable(self):
+        result = {}
+        for action, obj in self.actions:
+            result.setdefault(action.configurable, []).append((action, obj))
+        return result
+
+    def record_committed(self, configurables):
+        actions = self.actions_by_configurable()
+        for configurable in configurables:
+            configurable.committed_actions = actions.get(configurable, [])
+
+
+@contextmanager
+def phase(report, name):
+    if report is None:
+        yield
+        return
+    with report.phase(name):
+        yield
+
+
+def activate(configurables):
+    """Activate configurables that were committed together.
+
+    All snapshots are made before any configurable is activated, so
+    the snapshot a configurable uses has those of the others, even if
+    they are activated later.
+    """
+    snapshot = {}
+    for configurable in configurables:
+        configurable.snapshot(snapshot)
+    for configurable in configurables:
+        configurable.activate()
+
+
+def action_id(action, obj):
+    """Identify an action for comparison between commits.
+
+    An action is identified by its identifier and the object it is
+    performed on, so an action that is replaced by an equal one, as
+    happens when a package is scanned again, is not a change.
+    """
+    return action.identifier(), id(obj)
+
+
+def action_ids(actions):
+    return set([action_id(action, obj) for action, obj in actions])
+
+
+def prepare_actions(actions):
+    for action, obj in actions:
+        for prepared, prepared_obj in action.prepare(obj):
+            yield prepared, prepared_obj
+
+
+def performed_after(configurable, added):
+    """Check whether added actions would be performed after all others.
+
+    Also checks that they don't override actions the configurable
+    already has; performing them on top of the existing configuration
+    then has the same result as performing everything again.
+    """
+    action_map = configurable._action_map
+    if action_map is None:
+        return False
+    for action, obj in added:
+        if action.identifier() in action_map:
+            return False
+    existing = action_map.values()
+    if not existing or not added:
+        return True
+    return (min(action_sort_key(pair) for pair in added) >
+            max(action_sort_key(pair) for pair in existing))
 
 
 def sort_configurables(configurables):
@@ -1,10 +1,11 @@
 from .app import global_app
 from .config import Config
-from .model import Mount
+from .model import Mount, mount_key
 import morepath.directive
 from morepath import generic
-from .app import App
+from .app import App, state_traject
 from .request import Request, Response
+from .view import negotiate_content_type
 from werkzeug.wrappers import BaseResponse
 from werkzeug.exceptions import Unauthorized
 import morepath
@@ -14,7 +15,7 @@ from reg import mapply, KeyIndex
 assert morepath.directive  # we need to make the function directive work
 
 
-def setup():
+def setup(scan_cache=None):
     """Set up core Morepath framework configuration.
 
     Returns a :class:`Config` object; you can then :meth:`Config.scan`
@@ -23,9 +24,11 @@ def setup():
 
     See also :func:`autoconfig` and :func:`autosetup`.
 
+    :param scan_cache: optional :class:`morepath.scancache.ScanCache`
+      to speed up scanning.
     :returns: :class:`Config` object.
     """
-    config = Config()
+    config = Config(scan_cache)
     config.scan(morepath, ignore=['.tests'])
     return config
 
@@ -38,7 +41,8 @@ def traject_consume(request, model, lookup):
     get_model, stack, traject_variables = traject(request.unconsumed)
     if get_model is None:
         return None
-    variables = generic.context(model, default={}, lookup=lookup)
+    # copy, as the context may be cached
+    variables = dict(generic.context(model, default={}, lookup=lookup))
     variables['base'] = model
     variables['request'] = request
     variables.update(traject_variables)
@@ -65,34 +69,57 @@ def app_path(model, lookup):
 
 @global_app.function(generic.link, Request, object)
 def link(request, model):
-    lookup = request.lookup
-    result = []
+    result = mounts_path(request.mounts, request.mount_lookups)
     # path in inner mount
-    result.append(app_path(model, lookup=lookup))
-    # now path of mounts
-    mounts = request.mounts[:]
-    model = mounts.pop()
-    while mounts:
-        model_mount = mounts.pop()
-        result.append(app_path(model, lookup=model_mount.app.lookup()))
-        model = model_mount
-    result.reverse()
+    result.append(app_path(model, lookup=request.lookup))
     return '/'.join(result).strip('/')
 
 
-@global_app.function(generic.traject, App)
-def app_traject(app):
-    return app.traject
+def mounts_path(mounts, lookups):
+    """Paths of a chain of mounts, each within the app it is mounted in.
+
+    :param mounts: list of :class:`morepath.model.Mount`, outermost
+      first, as in ``request.mounts``.
+    :param lookups: the lookups the request used for the apps of these
+      mounts, as in ``request.mount_lookups``.
+    :returns: list of paths, excluding the outermost mount.
+    """
+    return [mount_path(mount, lookup)
+            for lookup, mount in zip(lookups, mounts[1:])]
+
+
+def mount_path(mount, lookup):
+    """Path of mount within the app it is mounted in.
+
+    The path is cached in the :class:`morepath.app.AppState` of
+    lookup, by the class and path variables of the mount.
+
+    :param mount: a :class:`morepath.model.Mount`.
+    :param lookup: the lookup of the app the mount is mounted in.
+    """
+    state = getattr(lookup, 'state', None)
+    if state is None:
+        return app_path(mount, lookup=lookup)
+    key = (mount.__class__, mount_key(mount.variables))
+    try:
+        result = state.mount_paths.get(key)
+    except TypeError:
+        # unhashable variables
+        return app_path(mount, lookup=lookup)
+    if result is None:
+        result = app_path(mount, lookup=lookup)
+        state.mount_paths.put(key, result)
+    return result
 
 
-@global_app.function(generic.lookup, Mount)
-def mount_lookup(model):
-    return model.app.lookup()
+@global_app.function(generic.traject, App)
+def app_traject(app, lookup):
+    return state_traject(app, lookup)
 
 
 @global_app.function(generic.traject, Mount)
-def mount_traject(model):
-    return model.app.traject
+def mount_traject(model, lookup):
+    return state_traject(model.app, lookup)
 
 
 @global_app.function(generic.context, Mount)
@@ -102,26 +129,59 @@ def mount_context(mount):
 
 @global_app.function(generic.response, Request, object)
 def get_response(request, model):
+    # timer is only set when metrics are collected
+    if request.timer is not None:
+        return get_timed_response(request, model, request.timer)
     view = generic.view.component(
         request, model, lookup=request.lookup,
         default=None)
     if view is None:
         return None
-    if not generic.permits(request.identity, model, view.permission,
-                           lookup=request.lookup):
+    if not request.permits(model, view.permission):
         # XXX needs to become forbidden?
         raise Unauthorized()
     content = view(request, model)
     if isinstance(content, BaseResponse):
         # the view took full control over the response
         return content
+    return render_response(request, view, content)
+
+
+def get_timed_response(request, model, timer):
+    """Like :func:`get_response`, but marks the phases on timer.
+
+    :param timer: a :class:`morepath.metrics.PhaseTimer`.
+    """
+    view = generic.view.component(
+        request, model, lookup=request.lookup,
+        default=None)
+    if view is None:
+        return None
+    timer.mark('resolve')
+    # the identity is cached on the request
+    request.identity
+    timer.mark('identity')
+    if not request.permits(model, view.permission):
+        raise Unauthorized()
+    timer.mark('permission')
+    content = view(request, model)
+    timer.mark('view')
+    if isinstance(content, BaseResponse):
+        return content
+    response = render_response(request, view, content)
+    timer.mark('render')
+    return response
+
+
+def render_response(request, view, content):
     # XXX consider always setting a default render so that view.render
     # can never be None
     if view.render is not None:
         response = view.render(content)
     else:
         response = Response(content)
-    return response
+    return generic.compress(request, response, lookup=request.lookup,
+                            cacheable=view.cacheable)
 
 
 @global_app.function(generic.permits, object, object, object)
@@ -141,3 +201,15 @@ def name_predicate(request, model):
                       default='GET')
 def request_method_predicate(request, model):
     return request.method
+
+
+@global_app.predicate(name='accept', index=KeyIndex, order=2,
+                      default='text/html')
+def accept_predicate(request, model):
+    # the view found depends on the Accept header
+    request.after(vary_accept)
+    return negotiate_content_type(request.headers.get('Accept'))
+
+
+def vary_accept(response):
+    response.vary.add('Accept')
@@ -4,7 +4,7 @@ from .error import ConfigError
 from .view import (register_view, render_json, render_html,
                    register_predicate)
 from .security import (register_permission_checker,
-                       Identity, NoIdentity)
+                       register_permission_cache, Identity, NoIdentity)
 from .model import register_model, register_root, register_mount
 from .traject import Path
 from reg import KeyIndex
@@ -115,6 +115,11 @@ class PermissionDirective(Directive):
         decorated function should return ``True`` only if the given
         identity exists and has that permission on the model.
 
+        To speed up :meth:`morepath.Request.filter_permitted`, the
+        decorated function can have a ``batch`` attribute with a
+        function that gets ``identity``, ``models`` and ``permission``
+        parameters and returns a list with a boolean for each model.
+
         :param model: the model class
         :param permission: permission class
         :param identity: identity to check permission for. If ``None``,
@@ -136,10 +141,30 @@ class PermissionDirective(Directive):
             app, self.identity, self.model, self.permission, obj)
 
 
+@directive('permission_cache')
+class PermissionCacheDirective(Directive):
+    def __init__(self, app):
+        """Register permission cache.
+
+        The decorated function should return an instance of
+        :class:`morepath.security.PermissionCache`. Permission
+        decisions for models that have a
+        :func:`morepath.generic.permission_key` are then cached across
+        requests.
+        """
+        super(PermissionCacheDirective, self).__init__(app)
+
+    def identifier(self):
+        return ('permission_cache',)
+
+    def perform(self, app, obj):
+        register_permission_cache(app, obj())
+
+
 @directive('view')
 class ViewDirective(Directive):
     def __init__(self, app, model, name='', render=None, permission=None,
-                 **predicates):
+                 cacheable=False, **predicates):
         '''Register a view for a model.
 
         The decorated function gets a ``request``
@@ -165,7 +190,14 @@ class ViewDirective(Directive):
         :param permission: a permission class. The model should have this
           permission, otherwise access to this view is forbidden. If omitted,
           the view function is public.
-        :param predicates: predicates to match this view on.
+        :param cacheable: if true, the view output is the same for
+          repeated requests, so that the compressed response body can be
+          cached. See :meth:`morepath.AppBase.compression`.
+        :param predicates: predicates to match this view on. Besides
+          ``request_method`` Morepath knows about ``accept``, which
+          negotiates between views of the same name using the
+          ``Accept`` header, i.e. ``accept='application/json'`` for a
+          JSON view and ``accept='text/html'`` for a HTML view.
         '''
         super(ViewDirective, self).__init__(app)
         self.model = model
@@ -175,6 +207,7 @@ class ViewDirective(Directive):
             'name': self.name
             }
         self.permission = permission
+        self.cacheable = cacheable
         self.kw = predicates
         self.predicates.update(predicates)
 
@@ -187,7 +220,8 @@ class ViewDirective(Directive):
             model=self.model,
             name=self.name,
             render=self.render,
-            permission=self.permission)
+            permission=self.permission,
+            cacheable=self.cacheable)
         args.update(self.kw)
         args.update(kw)
         return ViewDirective(**args)
@@ -198,7 +232,7 @@ class ViewDirective(Directive):
 
     def perform(self, app, obj):
         register_view(app, self.model, obj, self.render, self.permission,
-                      self.predicates)
+                      self.predicates, self.cacheable)
 
 
 @directive('predicate')
@@ -227,7 +261,9 @@ class PredicateDirective(Directive):
         """
         super(PredicateDirective, self).__init__(app)
         self.name = name
-        self.order = order
+        # not self.order, which is the order of the action in the
+        # configuration
+        self.predicate_order = order
         self.default = default
         self.index = index
 
@@ -235,14 +271,14 @@ class PredicateDirective(Directive):
         return ('predicate', self.name)
 
     def perform(self, app, obj):
-        register_predicate(app, self.name, self.order, self.default,
-                           self.index, obj)
+        register_predicate(app, self.name, self.predicate_order,
+                           self.default, self.index, obj)
 
 
 @directive('json')
 class JsonDirective(ViewDirective):
     def __init__(self, app, model, name='', render=None,
-                 permission=None, **predicates):
+                 permission=None, cacheable=False, **predicates):
         """Register JSON view.
 
         This is like :meth:`morepath.AppBase.view`, but with
@@ -261,17 +297,20 @@ class JsonDirective(ViewDirective):
         :param permission: a permission class. The model should have this
           permission, otherwise access to this view is forbidden. If omitted,
           the view function is public.
+        :param cacheable: if true, the compressed response body can be
+          cached.
         :param predicates: predicates to match this view on.
         """
         render = render or render_json
         super(JsonDirective, self).__init__(app, model, name, render,
-                                            permission, **predicates)
+                                            permission, cacheable,
+                                            **predicates)
 
 
 @directive('html')
 class HtmlDirective(ViewDirective):
     def __init__(self, app, model, name='', render=None,
-                 permission=None, **predicates):
+                 permission=None, cacheable=False, **predicates):
         """Register HTML view.
 
         This is like :meth:`morepath.AppBase.view`, but with
@@ -289,11 +328,14 @@ class HtmlDirective(ViewDirective):
         :param permission: a permission class. The model should have this
           permission, otherwise access to this view is forbidden. If omitted,
           the view function is public.
+        :param cacheable: if true, the compressed response body can be
+          cached.
         :param predicates: predicates to match this view on.
         """
         render = render or render_html
         super(HtmlDirective, self).__init__(app, model, name, render,
-                                            permission, **predicates)
+                                            permission, cacheable,
+                                            **predicates)
 
 
 @directive('root')
@@ -334,7 +376,7 @@ class RootDirective(Directive):
 
 @directive('mount')
 class MountDirective(Directive):
-    def __init__(self, base_app,  path, app):
+    def __init__(self, base_app,  path, app, cache=None, pool=None):
         """Mount sub application on path.
 
         The decorated function gets the variables specified in path as
@@ -343,10 +385,19 @@ class MountDirective(Directive):
 
         :param path: the path to mount the application on.
         :param app: the :class:`morepath.App` instance to mount.
+        :param cache: a :class:`morepath.model.MountContextCache` to
+          cache the contexts returned by the decorated function in.
+          Optional; by default the function is called for each
+          request that goes through the mount.
+        :param pool: a :class:`morepath.model.MountPool` to reuse
+          mounts from. Optional; by default a mount is created for
+          each request that goes through it.
         """
         super(MountDirective, self).__init__(base_app)
         self.mounted_app = app
         self.path = path
+        self.cache = cache
+        self.pool = pool
 
     def identifier(self):
         return ('path', Path(self.path).discriminator())
@@ -355,7 +406,8 @@ class MountDirective(Directive):
         return [('mount', self.mounted_app)]
 
     def perform(self, app, obj):
-        register_mount(app, self.mounted_app, self.path, obj)
+        register_mount(app, self.mounted_app, self.path, obj, self.cache,
+                       self.pool)
 
 
 @directive('identity_policy')
@@ -383,6 +435,28 @@ class IdentityPolicyDirective(Directive):
             generic.forget, Response, Request), policy.forget
 
 
+@directive('compression')
+class CompressionDirective(Directive):
+    def __init__(self, app):
+        '''Register response compression.
+
+        The decorated function should return an instance of a
+        compression policy, such as
+        :class:`morepath.compress.Compression`, which should have a
+        ``compress`` method.
+        '''
+        super(CompressionDirective, self).__init__(app)
+
+    def identifier(self):
+        return ('compression',)
+
+    def prepare(self, obj):
+        policy = obj()
+        app = self.configurable
+        yield app.function(
+            generic.compress, Request, Response), policy.compress
+
+
 @directive('function')
 class FunctionDirective(Directive):
     def __init__(self, app, target, *sources):
@@ -33,13 +33,6 @@ def context(model):
     return {}
 
 
-@reg.generic
-def lookup(obj):
-    """Get the lookup that this object is associated with.
-    """
-    raise NotImplementedError
-
-
 @reg.generic
 def path(model):
     """Get the path for a model in its own application.
@@ -80,6 +73,16 @@ def response(request, model):
     raise NotImplementedError
 
 
+@reg.generic
+def compress(request, response, cacheable=False):
+    """Compress response for the request.
+
+    Returns the response, which may be modified. By default no
+    compression takes place.
+    """
+    return response
+
+
 @reg.generic
 def identify(request):
     """Returns an Identity or None if no identity can be found.
@@ -114,6 +117,16 @@ def permits(identity, model, permission):
     raise NotImplementedError
 
 
+@reg.generic
+def permission_key(model):
+    """Returns a key for model to cache permission decisions with.
+
+    Returns None if permission decisions for the model should not be
+    cached across requests.
+    """
+    return None
+
+
 @reg.generic
 def user(identity):
     """Gives back a user object for the identity given.
@@ -0,0 +1,73 @@
+from collections import namedtuple
+from repoze.lru import LRUCache
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'size'])
+
+_MISSING = object()
+
+
+class LRUClassLookup(object):
+    """Class lookup with a bounded cache for each key.
+
+    Wraps another class lookup, such as a :class:`reg.ClassRegistry`.
+    Results are cached in a least recently used cache per key, which
+    is a generic function for lookups done by Morepath. Each cache
+    holds at most ``size`` results of :meth:`get` and :meth:`all`
+    together, so dynamically created classes cannot make it grow
+    without bounds.
+    """
+    def __init__(self, class_lookup, size=1000):
+        """
+        :param class_lookup: the class lookup to cache.
+        :param size: maximum amount of cached results per key.
+        :type size: int
+        """
+        self.class_lookup = class_lookup
+        self.size = size
+        self.caches = {}
+
+    def cache(self, key):
+        """The cache for a key.
+
+        :returns: a :class:`repoze.lru.LRUCache`.
+        """
+        cache = self.caches.get(key)
+        if cache is None:
+            cache = self.caches.setdefault(key, LRUCache(self.size))
+        return cache
+
+    def get(self, key, classes):
+        classes = tuple(classes)
+        cache = self.cache(key)
+        result = cache.get((False, classes), _MISSING)
+        if result is _MISSING:
+            result = self.class_lookup.get(key, classes)
+            cache.put((False, classes), result)
+        return result
+
+    def all(self, key, classes):
+        classes = tuple(classes)
+        cache = self.cache(key)
+        result = cache.get((True, classes), _MISSING)
+        if result is _MISSING:
+            result = list(self.class_lookup.all(key, classes))
+            cache.put((True, classes), result)
+        return result
+
+    def info(self):
+        """Statistics of the caches.
+
+        :returns: a dict with a :class:`CacheInfo` for each key that
+          was looked up, with the amount of hits, misses and evictions
+          and the current size of its cache.
+        """
+        return dict(
+            (key, CacheInfo(cache.hits, cache.misses, cache.evictions,
+                            len(cache.data)))
+            for key, cache in list(self.caches.items()))
+
+    def clear(self):
+        """Clear the caches and their statistics.
+        """
+        self.caches = {}
@@ -0,0 +1,279 @@
+import threading
+from bisect import bisect_left
+from timeit import default_timer
+from repoze.lru import LRUCache
+from .publish import resolve_model, respond
+from .request import Response
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+PHASES = ['resolve', 'identity', 'permission', 'view', 'render']
+
+METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'DELETE', 'PATCH',
+                     'OPTIONS'])
+
+# labels used for request values that do not correspond to anything
+# in the application, so clients cannot create new series at will
+UNMATCHED = '<unmatched>'
+OTHER = '<other>'
+
+
+class Histogram(object):
+    """Histogram with fixed buckets.
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # the last count is for values larger than the largest bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Cumulative counts per bucket upper bound.
+
+        :returns: list of ``(upper_bound, count)`` tuples, ending with
+          ``float('inf')``.
+        """
+        result = []
+        total = 0
+        bounds = list(self.buckets) + [float('inf')]
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class PhaseTimer(object):
+    """Time the phases of publishing a request.
+
+    Each :meth:`mark` adds the time since the previous mark to the
+    phase given.
+    """
+    unmatched = False
+    """``True`` if no view was found for the request.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.last = default_timer()
+
+    def mark(self, phase):
+        """Add time since the previous mark to phase.
+
+        :param phase: the name of the phase, one of ``PHASES``.
+        """
+        now = default_timer()
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self.last
+        self.last = now
+
+
+class Metrics(object):
+    """In-process registry of request metrics.
+
+    Assign an instance to :attr:`morepath.AppBase.metrics` to collect
+    metrics for an application. For each request the amount of requests
+    is counted, and the time spent in the phases of publication
+    (``resolve``, ``identity``, ``permission``, ``view`` and
+    ``render``) is recorded in a histogram. Metrics are labeled with
+    the model class, view name and request method. Requests for which
+    no view is found are labeled with view ``<unmatched>``, and
+    requests with an uncommon method with method ``<other>``, so that
+    the amount of series does not depend on what clients request.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: upper bounds of the histogram buckets, in seconds.
+        :type buckets: sorted sequence of float.
+        """
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        # metric keys per model class, view name, method and status
+        self._keys = LRUCache(1000)
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        """Increase a counter.
+
+        :param name: the metric name.
+        :param labels: tuple of ``(label, value)`` tuples.
+        :param amount: amount to increase counter with.
+        """
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        """Observe a value in a histogram.
+
+        :param name: the metric name.
+        :param labels: tuple of ``(label, value)`` tuples.
+        :param value: the value to observe.
+        """
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        """Get counter value.
+
+        :param name: the metric name.
+        :param labels: the labels of the counter.
+        :returns: the counter value, ``0`` if nothing was counted.
+        """
+        return self._counters.get((name, label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        """Get histogram.
+
+        :param name: the metric name.
+        :param labels: the labels of the histogram.
+        :returns: :class:`Histogram` instance, or ``None``.
+        """
+        return self._histograms.get((name, label_key(labels)))
+
+    def clear(self):
+        """Clear all collected metrics.
+        """
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def exposition(self):
+        """Metrics in the Prometheus text exposition format.
+
+        :returns: the exposition text.
+        """
+        result = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        names = set()
+        for (name, labels), value in counters:
+            if name not in names:
+                names.add(name)
+                result.append('# TYPE %s counter' % name)
+            result.append('%s%s %s' % (name, format_labels(labels), value))
+        for (name, labels), histogram in histograms:
+            if name not in names:
+                names.add(name)
+                result.append('# TYPE %s histogram' % name)
+            for bound, count in histogram.cumulative():
+                result.append('%s_bucket%s %s' % (
+                    name, format_labels(labels + (('le', bound),)), count))
+            result.append('%s_sum%s %r' % (name, format_labels(labels),
+                                           histogram.sum))
+            result.append('%s_count%s %s' % (name, format_labels(labels),
+                                             histogram.count))
+        result.append('')
+        return '\n'.join(result)
+
+    def view(self, request, model):
+        """View that serves the metrics in the Prometheus format.
+
+        Call it from a view of your application to expose the
+        metrics, for instance::
+
+          @app.view(model=Root, name='metrics')
+          def metrics(request, model):
+              return app.metrics.view(request, model)
+        """
+        response = Response(self.exposition())
+        response.content_type = 'text/plain; version=0.0.4'
+        return response
+
+    def publish(self, request, mount, respond=respond):
+        """Publish request while collecting metrics.
+
+        This is used instead of :func:`morepath.publish.publish` when
+        metrics are enabled. The phases are timed by
+        :func:`morepath.core.get_response` through ``request.timer``.
+
+        :param respond: function that creates the response for the
+          request and the model it was resolved to. By default
+          :func:`morepath.publish.respond`.
+        """
+        timer = request.timer = PhaseTimer()
+        model = resolve_model(request, mount)
+        timer.mark('resolve')
+        # if more than a view name is left, the path was not resolved
+        if len(request.unconsumed) > 1:
+            timer.unmatched = True
+        response = respond(request, model)
+        if timer.unmatched:
+            view_name = UNMATCHED
+        else:
+            view_name = request.view_name
+        method = request.method
+        if method not in METHODS:
+            method = OTHER
+        self.record(model.__class__, view_name, method,
+                    response.status_code, timer.timings)
+        return response
+
+    def record(self, model_class, view_name, method, status, timings):
+        keys = self._keys.get((model_class, view_name, method, status))
+        if keys is None:
+            keys = self.keys(model_class, view_name, method, status)
+        counter_key, phase_keys = keys
+        with self._lock:
+            counters = self._counters
+            counters[counter_key] = counters.get(counter_key, 0) + 1
+            histograms = self._histograms
+            for phase, value in timings.items():
+                key = phase_keys[phase]
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = Histogram(self.buckets)
+                histogram.observe(value)
+
+    def keys(self, model_class, view_name, method, status):
+        labels = {
+            'method': method,
+            'model': class_name(model_class),
+            'view': view_name,
+            }
+        result = (
+            ('morepath_requests_total', label_key(labels, status=status)),
+            dict([(phase, ('morepath_phase_seconds',
+                           label_key(labels, phase=phase)))
+                  for phase in PHASES]))
+        self._keys.put((model_class, view_name, method, status), result)
+        return result
+
+
+def label_key(labels, **extra):
+    if extra:
+        labels = dict(labels, **extra)
+    return tuple(sorted(labels.items()))
+
+
+def class_name(cls):
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        ['%s="%s"' % (name, format_label_value(value))
+         for (name, value) in labels])
+
+
+def format_label_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if value is None:
+        value = ''
+    return unicode(value).replace(
+        '\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
@@ -1,16 +1,33 @@
 from morepath import generic
 from morepath.traject import Traject
+from morepath.error import ConfigError
 from reg import mapply
+from reg.mapply import arginfo
+from repoze.lru import ExpiringLRUCache, LRUCache
 
 
 class Mount(object):
+    context_cache = None
+
     def __init__(self, app, context_factory, variables):
         self.app = app
         self.context_factory = context_factory
         self.variables = variables
 
     def create_context(self):
-        return mapply(self.context_factory, **self.variables)
+        cache = self.context_cache
+        if cache is None:
+            return mapply(self.context_factory, **self.variables)
+        try:
+            context = cache.get(self.variables)
+        except TypeError:
+            # unhashable variables, for instance from the context of
+            # the parent mount, cannot be cached
+            return mapply(self.context_factory, **self.variables)
+        if context is None:
+            context = mapply(self.context_factory, **self.variables)
+            cache.put(self.variables, context)
+        return context
 
     def __repr__(self):
         try:
@@ -21,6 +38,125 @@ class Mount(object):
             name, self.variables)
 
 
+class MountContextCache(object):
+    """Cache the contexts of a mounted app.
+
+    Pass an instance as the ``cache`` argument of the ``mount``
+    directive. The context dicts returned by the decorated function
+    are then cached by the values of the variables in the mount path,
+    so that the function is not called for each request that goes
+    through the mount. Use a separate cache for each mount, and do not
+    use one if the context depends on the request.
+
+    When the information the contexts are created from changes, call
+    :meth:`invalidate`.
+    """
+    def __init__(self, size=1000, timeout=None):
+        """
+        :param size: maximum amount of cached contexts.
+        :type size: int
+        :param timeout: amount of seconds a context remains cached.
+          If omitted, contexts remain cached until they are invalidated
+          or evicted.
+        :type timeout: int
+        """
+        if timeout is None:
+            self.cache = LRUCache(size)
+        else:
+            self.cache = ExpiringLRUCache(size, timeout)
+
+    def get(self, variables):
+        """Get cached context.
+
+        :returns: the context dict, or ``None`` if not cached.
+        """
+        return self.cache.get(mount_key(variables))
+
+    def put(self, variables, context):
+        """Cache context.
+        """
+        self.cache.put(mount_key(variables), context)
+
+    def invalidate(self, **variables):
+        """Invalidate cached contexts.
+
+        :param variables: the mount variables of the context to
+          invalidate. If omitted, all contexts are invalidated.
+        """
+        if not variables:
+            self.cache.clear()
+            return
+        self.cache.invalidate(mount_key(variables))
+
+
+class MountPool(object):
+    """Reuse the mounts of a mounted app.
+
+    Pass an instance as the ``pool`` argument of the ``mount``
+    directive. Normally a new mount is created for each request that
+    goes through it. With a pool, the mount for the values of the
+    variables in the mount path is reused instead, so that mounting
+    one app for many tenants costs one mount object for each tenant
+    that is in use. All of them share the lookup and traject of the
+    mounted app. A pooled mount does not have the ``request`` and
+    ``base`` variables, so the decorated function cannot take them.
+
+    Combine with :class:`MountContextCache` to also reuse the
+    contexts of the mounts. Use a separate pool for each mount.
+
+    A pool trades memory for time: it keeps up to ``size`` mounts
+    alive between requests, about a kilobyte each, where without a
+    pool a mount is garbage once its request is done. What it bounds
+    is the memory for the tenants in use, not the total. A context
+    cache keeps the contexts alive as well, which usually costs more
+    than the mounts; see ``benchmarks/tenants.py``.
+    """
+    def __init__(self, size=10000):
+        """
+        :param size: maximum amount of pooled mounts.
+        :type size: int
+        """
+        self.cache = LRUCache(size)
+
+    def get(self, mount_class, variables):
+        """Get pooled mount, creating it if needed.
+
+        :param mount_class: the :class:`Mount` subclass to create.
+        :param variables: the mount variables.
+        :returns: a ``mount_class`` instance with only the path
+          variables.
+        """
+        key = mount_key(variables)
+        try:
+            mount = self.cache.get(key)
+        except TypeError:
+            # unhashable variables, for instance from the context of
+            # the parent mount, cannot be pooled
+            return mount_class(**variables)
+        if mount is None:
+            mount = mount_class(**dict(key))
+            self.cache.put(key, mount)
+        return mount
+
+    def invalidate(self, **variables):
+        """Remove mounts from the pool.
+
+        :param variables: the mount variables of the mount to remove.
+          If omitted, all mounts are removed.
+        """
+        if not variables:
+            self.cache.clear()
+            return
+        self.cache.invalidate(mount_key(variables))
+
+
+def mount_key(variables):
+    # base and request are passed along with the path variables, but
+    # do not identify the mount
+    return tuple(sorted((name, value) for name, value in variables.items()
+                        if name not in ('base', 'request')))
+
+
 def register_root(app, model, model_factory):
     register_model(app, model, '', lambda model: {}, model_factory)
 
@@ -28,10 +164,14 @@ def register_root(app, model, model_factory):
 def register_model(app, model, path, variables, model_factory,
                    base=None, get_base=None):
     if base is not None:
-        traject = app.exact(generic.traject, [base])
-        if traject is None:
-            traject = Traject()
-            app.register(generic.traject, [base], lambda base: traject)
+        get_traject = app.exact(generic.traject, [base])
+        if get_traject is None:
+            inherited = getattr(app.get(generic.traject, [base]),
+                                'traject', None)
+            get_traject = traject_getter(
+                Traject([inherited] if inherited is not None else None))
+            app.register(generic.traject, [base], get_traject)
+        traject = get_traject.traject
     else:
         traject = app.traject
         if traject is None:
@@ -47,10 +187,32 @@ def register_model(app, model, path, variables, model_factory,
     app.register(generic.base, [model], get_base)
 
 
-def register_mount(base_app, app, path, context_factory):
+def traject_getter(traject):
+    def get_traject(base):
+        return traject
+    get_traject.traject = traject
+    return get_traject
+
+
+def register_mount(base_app, app, path, context_factory, cache=None,
+                   pool=None):
     # specific class as we want a different one for each mount
     class SpecificMount(Mount):
+        context_cache = cache
+
         def __init__(self, **kw):
             super(SpecificMount, self).__init__(app, context_factory, kw)
+
+    if pool is None:
+        model_factory = SpecificMount
+    else:
+        argnames, varargs, kwargs = arginfo(context_factory)
+        if kwargs or 'request' in argnames or 'base' in argnames:
+            raise ConfigError(
+                "Cannot pool mounts of %r: its context depends on the "
+                "request" % app)
+
+        def model_factory(**kw):
+            return pool.get(SpecificMount, kw)
     register_model(base_app, SpecificMount, path, lambda m: m.variables,
-                   SpecificMount)
+                   model_factory)
@@ -0,0 +1,125 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+from .publish import resolve_model, respond
+
+
+class Profiler(object):
+    """Profile a sample of requests using cProfile.
+
+    Assign an instance to :attr:`morepath.AppBase.profiler` to start
+    profiling. Requests are resolved to a model as usual; after this
+    the requests that are sampled are profiled while their response
+    is created. The statistics of all profiled requests are aggregated
+    in memory and can be written to a directory using :meth:`dump`.
+
+    If :attr:`morepath.AppBase.metrics` are collected as well, the
+    time spent profiling is included in them.
+    """
+    def __init__(self, rate=1, predicate=None, directory=None):
+        """
+        :param rate: profile one in every ``rate`` requests, at
+          least 1.
+        :type rate: int
+        :param predicate: optional function that gets ``request`` and
+          ``model`` and returns ``True`` if the request can be sampled.
+          You can use this to only profile requests for a particular
+          model or view.
+        :param directory: directory to write profile statistics to.
+        :type directory: str
+        """
+        if rate < 1:
+            raise ValueError("Profiling rate must be at least 1: %r" % rate)
+        self.rate = rate
+        self.predicate = predicate
+        self.directory = directory
+        self.samples = 0
+        self._count = 0
+        self._stats = None
+        self._lock = threading.Lock()
+
+    def sample(self, request, model):
+        """Determine whether to profile this request.
+
+        :param request: the request.
+        :type request: :class:`morepath.Request`
+        :param model: the model the request was resolved to.
+        :returns: ``True`` if the request should be profiled.
+        """
+        if self.predicate is not None and not self.predicate(request, model):
+            return False
+        with self._lock:
+            self._count += 1
+            return self._count % self.rate == 0
+
+    def publish(self, request, mount):
+        """Publish request, profiling it if it is sampled.
+
+        This is used instead of :func:`morepath.publish.publish` when
+        a profiler is set.
+        """
+        model = resolve_model(request, mount)
+        return self.respond(request, model)
+
+    def respond(self, request, model):
+        """Create response for model, profiling it if it is sampled.
+
+        This is used instead of :func:`morepath.publish.respond` when
+        metrics are collected as well.
+        """
+        if not self.sample(request, model):
+            return respond(request, model)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(respond, request, model)
+        finally:
+            self.add(profile)
+
+    def add(self, profile):
+        """Add statistics of a profile to the aggregated statistics.
+
+        :param profile: a :class:`cProfile.Profile` instance.
+        """
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+            self.samples += 1
+
+    @property
+    def stats(self):
+        """Aggregated :class:`pstats.Stats`, or ``None`` if no samples.
+        """
+        return self._stats
+
+    def clear(self):
+        """Clear the aggregated statistics.
+        """
+        with self._lock:
+            self._stats = None
+            self.samples = 0
+
+    def dump(self, directory=None):
+        """Write aggregated statistics to a file.
+
+        The file can be loaded with :mod:`pstats`.
+
+        :param directory: directory to write the file in. If omitted, the
+          directory given to the profiler is used.
+        :returns: the path of the written file, or ``None`` if there
+          were no samples to write.
+        """
+        if directory is None:
+            directory = self.directory
+        if directory is None:
+            raise ValueError("No directory to dump profile statistics to")
+        with self._lock:
+            if self._stats is None:
+                return None
+            path = os.path.join(directory, 'morepath-%s-%s.prof' % (
+                time.strftime('%Y%m%d-%H%M%S'), os.getpid()))
+            self._stats.dump_stats(path)
+        return path
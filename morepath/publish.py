@@ -14,6 +14,39 @@ class ResponseSentinel(object):
 RESPONSE_SENTINEL = ResponseSentinel()
 
 
+def pinned_state(app, lookup):
+    """Get the state of app that goes with lookup.
+
+    If lookup is that of a pinned :class:`morepath.app.AppState`,
+    this is the state of app committed together with it. Otherwise, or
+    if app was not committed together with it, this is the current
+    state of app.
+
+    :returns: a :class:`morepath.app.AppState`, or ``None`` if app was
+      never committed.
+    """
+    state = getattr(lookup, 'state', None)
+    if state is None:
+        return app.state
+    if state.app is app:
+        return state
+    pinned = state.states.get(app)
+    if pinned is None:
+        return app.state
+    return pinned
+
+
+def state_lookup(app, lookup):
+    """Get the lookup of app for use by a request that uses lookup.
+
+    See :func:`pinned_state`.
+    """
+    state = pinned_state(app, lookup)
+    if state is None:
+        return app.lookup()
+    return state.lookup
+
+
 def resolve_model(request, mount):
     """Resolve path to a model using consumers.
     """
@@ -22,16 +55,18 @@ def resolve_model(request, mount):
     mounts = request.mounts
     model = mount
     mounts.append(model)
+    request.mount_lookups.append(lookup)
     while request.unconsumed:
         next_model = generic.consume(request, model, lookup=lookup)
         if next_model is None:
             return model
         model = next_model
+        # only mounts switch to another lookup
         if isinstance(model, Mount):
             mounts.append(model)
-        # get new lookup for whatever we found if it exists
-        lookup = generic.lookup(model, lookup=lookup, default=lookup)
-        request.lookup = lookup
+            lookup = state_lookup(model.app, lookup)
+            request.mount_lookups.append(lookup)
+            request.lookup = lookup
     # if there is nothing (left), we consume toward a root model
     if not request.unconsumed:
         root_model = generic.consume(request, model, lookup=lookup)
@@ -48,6 +83,8 @@ def resolve_response(request, model):
     response = generic.response(request, model, default=RESPONSE_SENTINEL,
                                 lookup=request.lookup)
     if response is RESPONSE_SENTINEL:
+        if request.timer is not None:
+            request.timer.unmatched = True
         # XXX lookup error view and fallback to default
         raise NotFound()
     request.run_after(response)
@@ -65,9 +102,15 @@ def get_view_name(stack):
     assert False, "Unconsumed stack: %s" % create_path(stack)
 
 
-def publish(request, mount):
-    model = resolve_model(request, mount)
+def respond(request, model):
+    """Create response for model, including error responses.
+    """
     try:
         return resolve_response(request, model)
     except HTTPException as e:
         return e.get_response(request.environ)
+
+
+def publish(request, mount):
+    model = resolve_model(request, mount)
+    return respond(request, model)
@@ -0,0 +1,190 @@
+import argparse
+import importlib
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+class CommitReport(object):
+    """Report on where time and memory go during a commit.
+
+    Pass an instance to :meth:`morepath.Config.commit` to fill it in::
+
+      report = CommitReport()
+      config.commit(report=report)
+      print(report.format())
+
+    It records wall time and memory use per phase of the commit,
+    counts and timings per directive type, the number of actions per
+    configurable and the slowest actions performed.
+
+    Memory is measured with :mod:`tracemalloc` if it is available and
+    tracing; otherwise as the growth of the peak resident set size of
+    the process.
+    """
+    def __init__(self, top=10):
+        """
+        :param top: the number of slowest actions to keep.
+        :type top: int
+        """
+        self.top = top
+        self.phases = []
+        self.directives = {}
+        self.configurables = {}
+        self.slowest = []
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that measures a phase.
+
+        :param name: name of the phase.
+        """
+        memory = memory_usage()
+        start = time.time()
+        yield
+        self.phases.append({
+            'name': name,
+            'seconds': time.time() - start,
+            'memory': memory_usage() - memory,
+            })
+
+    def configurable(self, configurable, count):
+        """Record the number of actions of a configurable.
+        """
+        self.configurables[configurable_name(configurable)] = count
+
+    def action(self, action, seconds):
+        """Record that an action was performed.
+
+        :param action: the :class:`morepath.config.Action`.
+        :param seconds: how long performing it took.
+        """
+        name = action.__class__.__name__
+        info = self.directives.get(name)
+        if info is None:
+            info = self.directives[name] = {'count': 0, 'seconds': 0.0}
+        info['count'] += 1
+        info['seconds'] += seconds
+        if (len(self.slowest) >= self.top and
+                seconds <= self.slowest[-1]['seconds']):
+            return
+        codeinfo = getattr(action, 'codeinfo', lambda: None)()
+        self.slowest.append({
+            'directive': name,
+            'configurable': configurable_name(action.configurable),
+            'seconds': seconds,
+            'codeinfo': list(codeinfo) if codeinfo is not None else None,
+            })
+        self.slowest.sort(key=lambda info: -info['seconds'])
+        del self.slowest[self.top:]
+
+    def as_dict(self):
+        """The report as a JSON-serializable dict.
+        """
+        return {
+            'phases': self.phases,
+            'directives': self.directives,
+            'configurables': self.configurables,
+            'slowest': self.slowest,
+            }
+
+    def format(self):
+        """The report as text.
+        """
+        lines = ['Phases:']
+        for info in self.phases:
+            lines.append('  %-12s %9.4fs %+12d bytes' % (
+                info['name'], info['seconds'], info['memory']))
+        lines.append('Directives:')
+        for name, info in sorted(self.directives.items(),
+                                 key=lambda item: -item[1]['seconds']):
+            lines.append('  %-30s %6d %9.4fs' % (
+                name, info['count'], info['seconds']))
+        lines.append('Actions per configurable:')
+        for name, count in sorted(self.configurables.items()):
+            lines.append('  %-30s %6d' % (name, count))
+        lines.append('Slowest actions:')
+        for info in self.slowest:
+            codeinfo = info['codeinfo']
+            where = ('%s:%s' % tuple(codeinfo[:2])
+                     if codeinfo is not None else '?')
+            lines.append('  %9.4fs %s on %s at %s' % (
+                info['seconds'], info['directive'], info['configurable'],
+                where))
+        return '\n'.join(lines)
+
+
+def memory_usage():
+    """Current memory use in bytes, as well as it can be measured.
+    """
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    if resource is not None:
+        # kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return 0
+
+
+def configurable_name(configurable):
+    name = getattr(configurable, 'name', None)
+    if name:
+        return name
+    return repr(configurable)
+
+
+def main(argv=None):
+    """Report on loading and committing Morepath configuration.
+
+    Loads configuration with :func:`morepath.autoconfig`, or scans
+    the packages given, and commits it, printing a
+    :class:`CommitReport`.
+    """
+    from .autosetup import autoconfig
+    from .core import setup
+
+    parser = argparse.ArgumentParser(
+        description="Report time and memory used to commit "
+        "Morepath configuration.")
+    parser.add_argument('packages', nargs='*',
+                        help="packages to scan; by default all packages "
+                        "that depend on Morepath")
+    parser.add_argument('--top', type=int, default=10,
+                        help="number of slowest actions to report")
+    parser.add_argument('--json', action='store_true',
+                        help="output JSON")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="measure memory with tracemalloc")
+    args = parser.parse_args(argv)
+
+    if args.tracemalloc:
+        if tracemalloc is None:
+            parser.error("tracemalloc is not available")
+        tracemalloc.start()
+    report = CommitReport(args.top)
+    with report.phase('scan'):
+        if args.packages:
+            config = setup()
+            for name in args.packages:
+                config.scan(importlib.import_module(name))
+        else:
+            config = autoconfig()
+    config.commit(report=report)
+    if args.json:
+        sys.stdout.write(json.dumps(report.as_dict(), indent=2) + '\n')
+    else:
+        sys.stdout.write(report.format() + '\n')
+
+
+if __name__ == '__main__':
+    main()
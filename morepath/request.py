@@ -1,4 +1,5 @@
 from morepath import generic
+from reg import mapply
 from werkzeug.wrappers import (BaseRequest, BaseResponse,
                                CommonResponseDescriptorsMixin)
 from werkzeug.utils import cached_property
@@ -10,11 +11,20 @@ class Request(BaseRequest):
 
     Extends :class:`werkzeug.wrappers.BaseRequest`
     """
+    timer = None
+    """:class:`morepath.metrics.PhaseTimer` timing the phases of
+    publishing this request, if metrics are collected.
+    """
+
     def __init__(self, environ, populate_request=True, shallow=False):
         super(Request, self).__init__(environ, populate_request, shallow)
         self.unconsumed = parse_path(self.path)
         self.mounts = []
+        # the lookup used for the app of each mount
+        self.mount_lookups = []
         self._after = []
+        self._predicate_values = {}
+        self._permits = {}
 
     @cached_property
     def identity(self):
@@ -56,6 +66,127 @@ class Request(BaseRequest):
             return None
         return view(self, model)
 
+    def permits(self, model, permission):
+        """Check whether the identity of this request has permission.
+
+        The decision is remembered for the rest of this request. If a
+        permission cache has been registered, decisions for models that
+        have a permission key are cached across requests as well. See
+        :class:`morepath.security.PermissionCache`.
+
+        :param model: the model to check permission for.
+        :param permission: the permission instance to check for.
+        :returns: ``True`` if the identity has permission.
+        """
+        result = self._memoized_permit(model, permission)
+        if result is not None:
+            return result
+        cache = self.lookup.component('permission_cache', (), default=None)
+        key_func = self._permission_key_func(cache, model)
+        result, cache_key = self._cached_permit(cache, key_func, model,
+                                                permission)
+        if result is not None:
+            return result
+        result = bool(generic.permits(self.identity, model, permission,
+                                      lookup=self.lookup))
+        self._remember_permit(cache, model, permission, result, cache_key)
+        return result
+
+    def filter_permitted(self, models, permission):
+        """Filter models by permission.
+
+        Decisions are remembered and cached like those of
+        :meth:`permits`. For the other models, the permission checker
+        is looked up once per model class. If the checker function has
+        a ``batch`` attribute, this is called once per model class
+        instead of calling the checker for each model. It should be a
+        function that gets ``identity``, ``models`` and ``permission``
+        parameters and returns a list of booleans, one for each model
+        in ``models``.
+
+        :param models: iterable of models to filter.
+        :param permission: the permission instance to check for.
+        :returns: iterator over the permitted models, in their
+          original order.
+        """
+        models = list(models)
+        identity = self.identity
+        lookup = self.lookup
+        cache = lookup.component('permission_cache', (), default=None)
+        key_funcs = {}
+        permitted = [False] * len(models)
+        unknown_by_class = {}
+        for i, model in enumerate(models):
+            result = self._memoized_permit(model, permission)
+            if result is not None:
+                permitted[i] = result
+                continue
+            model_class = model.__class__
+            if model_class not in key_funcs:
+                key_funcs[model_class] = self._permission_key_func(cache,
+                                                                   model)
+            key_func = key_funcs[model_class]
+            result, cache_key = self._cached_permit(cache, key_func, model,
+                                                    permission)
+            if result is not None:
+                permitted[i] = result
+                continue
+            unknown_by_class.setdefault(model_class, []).append(
+                (i, cache_key))
+        for unknown in unknown_by_class.values():
+            class_models = [models[i] for (i, cache_key) in unknown]
+            checker = generic.permits.component(
+                identity, class_models[0], permission, lookup=lookup)
+            batch = getattr(checker, 'batch', None)
+            if batch is not None:
+                results = mapply(batch, identity, class_models, permission,
+                                 lookup=lookup)
+            else:
+                results = [mapply(checker, identity, model, permission,
+                                  lookup=lookup)
+                           for model in class_models]
+            for (i, cache_key), result in zip(unknown, results):
+                result = bool(result)
+                permitted[i] = result
+                self._remember_permit(cache, models[i], permission, result,
+                                      cache_key)
+        return (model for (model, p) in zip(models, permitted) if p)
+
+    def _memoized_permit(self, model, permission):
+        memo = self._permits.get((id(model), permission.__class__))
+        if memo is not None and memo[0] is model:
+            return memo[1]
+        return None
+
+    def _permission_key_func(self, cache, model):
+        # the permission_key function for models of the class of model,
+        # or None if their decisions are not cached
+        if cache is None:
+            return None
+        return generic.permission_key.component(model, lookup=self.lookup,
+                                                default=None)
+
+    def _cached_permit(self, cache, key_func, model, permission):
+        # returns the cached decision or None, and the key to cache a
+        # new decision with, if any
+        if key_func is None:
+            return None, None
+        model_key = mapply(key_func, model, lookup=self.lookup)
+        if model_key is None:
+            return None, None
+        cache_key = cache.key(self.identity, model, model_key, permission)
+        if cache_key is None:
+            return None, None
+        result = cache.get(cache_key)
+        if result is not None:
+            self._permits[(id(model), permission.__class__)] = model, result
+        return result, cache_key
+
+    def _remember_permit(self, cache, model, permission, result, cache_key):
+        if cache_key is not None:
+            cache.put(cache_key, result)
+        self._permits[(id(model), permission.__class__)] = model, result
+
     # XXX add way to easily generate URL parameters too
     # XXX how to make link work in other application context?
     def link(self, model, name=''):
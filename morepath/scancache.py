@@ -0,0 +1,178 @@
+import json
+import os
+
+
+class ScanCache(object):
+    """On-disk cache of the modules in a package that have configuration.
+
+    Scanning a package imports every module in it, and inspects all
+    their members. With a scan cache, :meth:`morepath.Config.scan`
+    remembers which modules of a package contain configuration. When
+    the package is scanned again and none of its ``.py`` files were
+    added, removed or changed (by modification time and size), only
+    these modules are imported and scanned; all others are skipped.
+
+    The configuration actions found are exactly the same, in the same
+    order, as when the package is scanned without a cache.
+    """
+    def __init__(self, path):
+        """
+        :param path: the path of the file to store the cache in.
+        :type path: str
+        """
+        self.path = path
+        self._data = None
+
+    def load(self):
+        if self._data is not None:
+            return self._data
+        try:
+            with open(self.path) as f:
+                self._data = json.load(f)
+        except (IOError, ValueError):
+            self._data = {}
+        return self._data
+
+    def save(self):
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(self._data, f)
+        os.rename(tmp_path, self.path)
+
+    def configured_modules(self, package, fingerprint, ignore=None):
+        """Get names of modules in package that have configuration.
+
+        :param package: the package.
+        :param fingerprint: the current fingerprint of the package.
+        :param ignore: the ignore the package is scanned with, as
+          returned by :func:`ignore_key`.
+        :returns: a list of dotted module names, or ``None`` if the
+          package was not cached with this ignore or has changed since.
+        """
+        entry = self.load().get(package.__name__)
+        if (entry is None or entry['fingerprint'] != fingerprint or
+                entry.get('ignore') != ignore):
+            return None
+        return entry['modules']
+
+    def store(self, package, fingerprint, modules, ignore=None):
+        """Store names of modules in package that have configuration.
+
+        :param package: the package.
+        :param fingerprint: the fingerprint of the package.
+        :param modules: a list of dotted module names.
+        :param ignore: the ignore the package was scanned with, as
+          returned by :func:`ignore_key`.
+        """
+        self.load()[package.__name__] = {
+            'fingerprint': fingerprint,
+            'ignore': ignore,
+            'modules': modules,
+            }
+        self.save()
+
+    def scan(self, scanner, package, ignore=None):
+        """Scan package using the cache.
+
+        :param scanner: the :class:`venusian.Scanner` to scan with. Its
+          ``config`` is the :class:`morepath.Config` being scanned into.
+        :param package: the package to scan.
+        :param ignore: Venusian_ style ignore.
+        """
+        key = ignore_key(ignore)
+        if not hasattr(package, '__path__') or key is False:
+            # a module, nothing to skip, or an ignore we cannot store
+            scanner.scan(package, ignore=ignore)
+            return
+        fingerprint = package_fingerprint(package)
+        configured = self.configured_modules(package, fingerprint, key)
+        if configured is not None:
+            scanner.scan(package, ignore=ignores(
+                ignore, unconfigured_ignore(package, fingerprint,
+                                            configured)))
+            return
+        config = scanner.config
+        actions_count = len(config.actions)
+        configurables_count = len(config.configurables)
+        scanner.scan(package, ignore=ignore)
+        found = [action for (action, obj) in
+                 config.actions[actions_count:]]
+        found.extend(config.configurables[configurables_count:])
+        modules = []
+        for obj in found:
+            name = attached_module_name(obj)
+            if name is not None and name not in modules:
+                modules.append(name)
+        self.store(package, fingerprint, modules, key)
+
+
+def ignore_key(ignore):
+    """Ignore in a form that can be stored in the cache.
+
+    :param ignore: Venusian_ style ignore.
+    :returns: a sorted list of the ignored names, ``None`` if nothing
+      is ignored, or ``False`` if ignore contains callables, which
+      cannot be stored.
+    """
+    if ignore is None:
+        return None
+    if not isinstance(ignore, list):
+        ignore = [ignore]
+    if not all(isinstance(name, basestring) for name in ignore):
+        return False
+    return sorted(ignore)
+
+
+def package_fingerprint(package):
+    """Fingerprint of the Python source files in a package.
+
+    :returns: a list of ``[path, relative path, mtime, size]`` lists.
+    """
+    result = []
+    for path in package.__path__:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith('.py'):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                stat = os.stat(full_path)
+                result.append([path, os.path.relpath(full_path, path),
+                               stat.st_mtime, stat.st_size])
+    return result
+
+
+def module_names(package, fingerprint):
+    for path, relpath, mtime, size in fingerprint:
+        parts = relpath[:-len('.py')].split(os.sep)
+        if parts[-1] == '__init__':
+            parts = parts[:-1]
+        yield '.'.join([package.__name__] + parts)
+
+
+def unconfigured_ignore(package, fingerprint, configured):
+    needed = set()
+    for name in configured:
+        parts = name.split('.')
+        for i in range(1, len(parts) + 1):
+            needed.add('.'.join(parts[:i]))
+    skipped = set(module_names(package, fingerprint)) - needed
+
+    def ignore(fullname):
+        return fullname in skipped
+    return ignore
+
+
+def ignores(ignore, extra):
+    if ignore is None:
+        return [extra]
+    if isinstance(ignore, basestring) or callable(ignore):
+        return [ignore, extra]
+    return list(ignore) + [extra]
+
+
+def attached_module_name(obj):
+    attach_info = getattr(obj, 'attach_info', None)
+    if attach_info is None:
+        return None
+    return getattr(attach_info.module, '__name__', None)
@@ -1,6 +1,14 @@
 from .request import Request, Response
+from collections import OrderedDict
 from morepath import generic
+from repoze.lru import ExpiringLRUCache, LRUCache
 from werkzeug import parse_authorization_header
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
 
 
 class NoIdentity(object):
@@ -15,16 +23,58 @@ class Identity(object):
 
     Note that this identity is just a claim; to authenticate the user
     and authorize them you need to implement Morepath permission directives.
+
+    Identities are immutable. They are hashable if the extra
+    information is hashable, so they can be used as cache keys.
     """
+    __slots__ = ('userid', '_extra', '_hash')
+
     def __init__(self, userid, **kw):
         """
         :param userid: The userid of this identity
         :param kw: Extra information to store in identity.
         """
-        self.userid = userid
-        self._names = kw.keys()
-        for key, value in kw.items():
-            setattr(self, key, value)
+        object.__setattr__(self, 'userid', userid)
+        object.__setattr__(self, '_extra', kw)
+        try:
+            h = hash((userid, frozenset(kw.items())))
+        except TypeError:
+            # extra information is not hashable
+            h = None
+        object.__setattr__(self, '_hash', h)
+
+    def __getattr__(self, name):
+        if name == '_extra':
+            raise AttributeError(name)
+        try:
+            return self._extra[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Identity is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Identity is immutable")
+
+    def __hash__(self):
+        if self._hash is None:
+            raise TypeError("Identity with unhashable information")
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Identity):
+            return NotImplemented
+        return self.userid == other.userid and self._extra == other._extra
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __reduce__(self):
+        return (create_identity, (self.__class__, self.userid, self._extra))
 
     def as_dict(self):
         """Export identity as dictionary.
@@ -34,22 +84,42 @@ class Identity(object):
 
         :returns: dict with identity info.
         """
-        result = {
-            'userid': self.userid,
-            }
-        for name in self._names:
-            result[name] = getattr(self, name)
+        result = self._extra.copy()
+        result['userid'] = self.userid
         return result
 
 
+def create_identity(cls, userid, extra):
+    return cls(userid, **extra)
+
+
 class BasicAuthIdentityPolicy(object):
     """Identity policy that uses HTTP Basic Authentication.
 
-    Note that this policy does **not** do any password validation. You're
-    expected to do so using permission directives.
+    Note that by default this policy does **not** do any password
+    validation. You're expected to do so using permission directives,
+    or to supply a ``verify`` function.
     """
-    def __init__(self, realm='Realm'):
+    def __init__(self, realm='Realm', verify=None, cache_size=1000,
+                 cache_timeout=300):
+        """
+        :param realm: the realm to authenticate for.
+        :param verify: optional function that gets ``username`` and
+          ``password`` and returns ``True`` if the password is correct.
+          If given, only verified users get an identity, without the
+          password. Successful verifications are cached, so that a slow
+          password hash is not calculated on each request.
+        :param cache_size: the maximum amount of cached verifications.
+        :type cache_size: int
+        :param cache_timeout: the amount of seconds a verification is
+          cached.
+        :type cache_timeout: int
+        """
         self.realm = realm
+        self.verify = verify
+        self.cache = ExpiringLRUCache(cache_size, cache_timeout)
+        # the salt makes sure the cache keys cannot be precomputed
+        self._salt = os.urandom(16)
 
     def identify(self, request):
         """Establish claimed identity using request.
@@ -67,7 +137,30 @@ class BasicAuthIdentityPolicy(object):
         if auth.password is None:
             # not basic auth
             return None
-        return Identity(userid=auth.username, password=auth.password)
+        if self.verify is None:
+            return Identity(userid=auth.username, password=auth.password)
+        if not self.verified(auth.username, auth.password):
+            return None
+        return Identity(userid=auth.username)
+
+    def verified(self, username, password):
+        """Verify credentials, using the cache if possible.
+
+        The number of cache hits and misses is available as
+        ``cache.hits`` and ``cache.misses``.
+
+        :param username: the username.
+        :param password: the password.
+        :returns: ``True`` if the credentials are correct.
+        """
+        key = hashlib.sha256(self._salt + encode(username) + '\0' +
+                             encode(password)).digest()
+        if self.cache.get(key) is not None:
+            return True
+        if not self.verify(username, password):
+            return False
+        self.cache.put(key, True)
+        return True
 
     def remember(self, response, request, identity):
         """Remember identity on response.
@@ -101,8 +194,239 @@ class BasicAuthIdentityPolicy(object):
                              'Basic realm="%s"' % self.realm)
 
 
+class PermissionCache(object):
+    """Cache permission decisions across requests.
+
+    Register an instance using the ``permission_cache`` directive.
+
+    Decisions are cached by identity, model and permission class.
+    Only models for which a key is provided by registering a
+    :func:`morepath.generic.permission_key` function are cached, for
+    instance::
+
+      @app.function(generic.permission_key, Document)
+      def document_permission_key(model):
+          return model.id
+
+    The whole identity is part of the key, not just its userid, so an
+    identity that was not verified, such as one that
+    :class:`BasicAuthIdentityPolicy` without ``verify`` creates with
+    the password in it, does not share decisions with the verified
+    identity of the same user. Decisions for identities with
+    unhashable information are not cached.
+
+    When permissions change, call :meth:`invalidate`.
+    """
+    def __init__(self, size=1000, timeout=60):
+        """
+        :param size: maximum amount of cached decisions.
+        :type size: int
+        :param timeout: amount of seconds a decision remains cached.
+        :type timeout: int
+        """
+        self.timeout = timeout
+        self.cache = ExpiringLRUCache(size, timeout)
+        # userid to generation and time of its last invalidation,
+        # oldest first
+        self._generations = OrderedDict()
+        self._generation = 0
+
+    def key(self, identity, model, model_key, permission):
+        """Cache key for a permission decision.
+
+        :returns: the key, or ``None`` if the decision cannot be cached.
+        """
+        try:
+            hash(identity)
+        except TypeError:
+            return None
+        generation = self._generations.get(identity.userid)
+        if generation is not None:
+            generation = generation[0]
+        return (identity, generation, model.__class__, model_key,
+                permission.__class__)
+
+    def get(self, key):
+        """Get cached decision.
+
+        :returns: ``True`` or ``False``, or ``None`` if not cached.
+        """
+        return self.cache.get(key)
+
+    def put(self, key, permitted):
+        """Cache decision.
+        """
+        self.cache.put(key, permitted)
+
+    def invalidate(self, userid=None):
+        """Invalidate cached decisions.
+
+        :param userid: only invalidate decisions for this userid. If
+          omitted, all decisions are invalidated.
+        """
+        if userid is None:
+            self.cache.clear()
+            self._generations.clear()
+            return
+        now = time.time()
+        # an invalidation older than the timeout is forgotten, as the
+        # decisions cached before it have expired. Those cached after
+        # it are then not found anymore, not even after a later
+        # invalidation, as generations are never reused
+        generations = self._generations
+        while generations:
+            oldest = next(iter(generations))
+            if generations[oldest][1] + self.timeout > now:
+                break
+            del generations[oldest]
+        # decisions cached for an older generation are not found anymore
+        self._generation += 1
+        generations.pop(userid, None)
+        generations[userid] = self._generation, now
+
+
+class SignedTokenIdentityPolicy(object):
+    """Identity policy that uses HMAC signed tokens.
+
+    The identity is stored in a token that contains the identity
+    information as returned by :meth:`Identity.as_dict` and an
+    expiration time, signed using HMAC with a secret. The token is
+    remembered in a cookie. It can also be sent by the client in an
+    ``Authorization: Bearer <token>`` header.
+
+    Tokens that are verified are cached, so that the signature is not
+    verified and the identity is not reconstructed again for the same
+    token while it is valid.
+
+    Note that the token is signed, not encrypted, so do not store
+    secret information in the identity.
+    """
+    def __init__(self, secret, cookie_name='morepath_token', max_age=3600,
+                 cache_size=1000, digestmod=hashlib.sha256):
+        """
+        :param secret: the secret to sign tokens with.
+        :type secret: str
+        :param cookie_name: the name of the cookie to store the token in.
+        :param max_age: the amount of seconds a token is valid.
+        :type max_age: int
+        :param cache_size: the maximum amount of verified tokens to cache.
+        :type cache_size: int
+        :param digestmod: the hash function used for HMAC.
+        """
+        self.secret = secret
+        self.cookie_name = cookie_name
+        self.max_age = max_age
+        self.digestmod = digestmod
+        self.cache = LRUCache(cache_size)
+
+    def _sign(self, data):
+        return base64.urlsafe_b64encode(
+            hmac.new(self.secret, data, self.digestmod).digest())
+
+    def create_token(self, identity):
+        """Create a signed token for identity.
+
+        :param identity: identity to create token for.
+        :type identity: :class:`morepath.security.Identity`
+        :returns: the token.
+        """
+        info = identity.as_dict()
+        info['expires'] = int(time.time()) + self.max_age
+        data = base64.urlsafe_b64encode(json.dumps(info))
+        return data + '.' + self._sign(data)
+
+    def verify_token(self, token):
+        """Verify token and get identity from it.
+
+        :param token: the token to verify.
+        :returns: :class:`morepath.security.Identity` instance, or
+          ``None`` if the token is invalid or has expired.
+        """
+        now = time.time()
+        cached = self.cache.get(token)
+        if cached is not None:
+            identity, expires = cached
+            if expires < now:
+                self.cache.invalidate(token)
+                return None
+            return identity
+        try:
+            data, signature = str(token).split('.')
+        except (ValueError, UnicodeError):
+            return None
+        if not hmac.compare_digest(self._sign(data), signature):
+            return None
+        try:
+            info = json.loads(base64.urlsafe_b64decode(data))
+            expires = info.pop('expires')
+        except (ValueError, TypeError, KeyError):
+            return None
+        if expires < now:
+            return None
+        identity = Identity(**info)
+        self.cache.put(token, (identity, expires))
+        return identity
+
+    def identify(self, request):
+        """Establish claimed identity using request.
+
+        :param request: Request to extract identity information from.
+        :type request: :class:`morepath.Request`.
+        :returns: :class:`morepath.security.Identity` instance.
+        """
+        token = None
+        header = request.headers.get('Authorization')
+        if header is not None:
+            parts = header.split(None, 1)
+            if len(parts) == 2 and parts[0].lower() == 'bearer':
+                token = parts[1].strip()
+        if token is None:
+            token = request.cookies.get(self.cookie_name)
+        if token is None:
+            return None
+        return self.verify_token(token)
+
+    def remember(self, response, request, identity):
+        """Remember identity on response.
+
+        Sets a cookie with a signed token.
+
+        :param response: response object on which to store identity.
+        :type response: :class:`morepath.Response`
+        :param request: request object.
+        :type request: :class:`morepath.Request`
+        :param identity: identity to remember.
+        :type identity: :class:`morepath.security.Identity`
+        """
+        response.set_cookie(self.cookie_name, self.create_token(identity),
+                            max_age=self.max_age, httponly=True)
+
+    def forget(self, response, request):
+        """Forget identity on response.
+
+        Removes the cookie with the token. Note that a token that was
+        handed out remains valid until it expires.
+
+        :param response: response object on which to forget identity.
+        :type response: :class:`morepath.Response`
+        :param request: request object.
+        :type request: :class:`morepath.Request`
+        """
+        response.delete_cookie(self.cookie_name)
+
+
+def encode(s):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    return s
+
+
 def register_permission_checker(registry, identity, model, permission, func):
     registry.register(generic.permits, (identity, model, permission), func)
 
 
+def register_permission_cache(registry, cache):
+    registry.register('permission_cache', (), cache)
+
+
 # XXX request.user property
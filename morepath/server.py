@@ -0,0 +1,147 @@
+import errno
+import os
+import signal
+import sys
+import time
+import traceback
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+
+
+class WorkerServer(WSGIServer):
+    """WSGI server that shares its listening socket with other workers.
+
+    The listening socket is non-blocking, so a worker that loses the
+    race for a connection to another worker goes back to waiting
+    instead of blocking in ``accept``.
+    """
+    def server_activate(self):
+        WSGIServer.server_activate(self)
+        self.socket.setblocking(0)
+
+    def get_request(self):
+        conn, address = WSGIServer.get_request(self)
+        conn.setblocking(1)
+        return conn, address
+
+
+class PreforkServer(object):
+    """Pre-forking WSGI server using only the standard library.
+
+    The server listens in the parent process and forks a number of
+    worker processes that accept connections on the shared socket.
+    Workers that exit are replaced. On ``SIGTERM`` or ``SIGINT`` the
+    workers finish the request they are handling and exit, after which
+    the server stops.
+
+    Commit the configuration before starting the server, preferably
+    with ``freeze=True``. The workers then inherit the committed and
+    warmed up registries from the parent copy-on-write instead of each
+    building their own::
+
+      config.commit(freeze=True)
+      PreforkServer(app, workers=4).serve_forever()
+
+    Only available on platforms with :func:`os.fork`.
+    """
+    def __init__(self, app, host='127.0.0.1', port=5000, workers=2,
+                 poll_interval=0.5, handler_class=WSGIRequestHandler):
+        """
+        :param app: the WSGI application to serve.
+        :param host: hostname to listen on.
+        :param port: port to listen on. If 0, a free port is picked;
+          see :attr:`port`.
+        :param workers: the amount of worker processes.
+        :type workers: int
+        :param poll_interval: seconds between checks of a worker
+          whether it should stop.
+        :param handler_class: the
+          :class:`wsgiref.simple_server.WSGIRequestHandler` to handle
+          requests with.
+        """
+        self.app = app
+        self.workers = workers
+        self.server = make_server(host, port, app,
+                                  server_class=WorkerServer,
+                                  handler_class=handler_class)
+        self.server.timeout = poll_interval
+        self.pids = {}
+        self.stopping = False
+
+    @property
+    def port(self):
+        """The port the server listens on.
+        """
+        return self.server.server_address[1]
+
+    def serve_forever(self):
+        """Start the workers and replace them when they exit.
+
+        Returns when the server is stopped and all workers have exited.
+        """
+        handlers = dict(
+            (signum, signal.signal(signum, self.stop))
+            for signum in (signal.SIGTERM, signal.SIGINT))
+        try:
+            for i in range(self.workers):
+                self.spawn()
+            while self.pids:
+                try:
+                    pid, status = os.wait()
+                except OSError as e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                started = self.pids.pop(pid, None)
+                if started is None or self.stopping:
+                    continue
+                # don't restart a worker that keeps failing in a tight loop
+                if time.time() - started < 1:
+                    time.sleep(1)
+                if not self.stopping:
+                    self.spawn()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+            self.server.server_close()
+
+    def spawn(self):
+        """Fork a worker process.
+        """
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self.work()
+            except:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(code)
+        self.pids[pid] = time.time()
+
+    def work(self):
+        """Handle requests until told to stop.
+
+        Runs in a worker process.
+        """
+        self.pids = {}
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop_worker)
+        # the parent stops the workers on SIGINT
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        while not self.stopping:
+            self.server.handle_request()
+
+    def stop(self, signum=None, frame=None):
+        """Stop the server after the workers finish their requests.
+        """
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def stop_worker(self, signum=None, frame=None):
+        self.stopping = True
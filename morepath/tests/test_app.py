@@ -1,4 +1,10 @@
 from morepath.app import App, global_app
+from morepath import setup, generic
+from morepath.error import ConfigError
+from morepath.publish import publish
+from morepath.request import Request, Response
+from werkzeug.test import Client, EnvironBuilder
+import pytest
 
 
 def test_global_app():
@@ -46,3 +52,149 @@ def test_app_caching_lookup():
     # but different parameters does trigger another call
     lookup.component('bar', [])
     assert myapp.called == 2
+
+
+def test_commit_swaps_state_atomically():
+
+    app = App()
+
+    class User(object):
+        def __init__(self, username):
+            self.username = username
+
+    def configure(path, swap_config=None):
+        c = setup()
+        c.configurable(app)
+        c.action(
+            app.model(
+                path=path,
+                variables=lambda model: {'username': model.username}),
+            User)
+
+        def view(request, model):
+            old_lookup = request.lookup
+            if swap_config is not None:
+                swap_config.commit()
+            assert request.lookup is old_lookup
+            return request.link(model)
+
+        c.action(app.view(model=User), view)
+        return c
+
+    new_config = configure('people/{username}')
+    old_config = configure('users/{username}', new_config)
+    old_config.commit()
+    old_state = app.state
+
+    cl = Client(app, Response)
+    # the request started before the commit finishes with the old state
+    assert cl.get('/users/foo').data == 'users/foo'
+    assert app.state is not old_state
+    assert app.lookup() is app.state.lookup
+    # new requests get the new state
+    assert cl.get('/users/foo').status == '404 NOT FOUND'
+    assert cl.get('/people/foo').data == 'people/foo'
+    # the old state is untouched
+    assert old_state.traject(['foo', 'users'])[0] is not None
+    assert old_state.traject(['foo', 'people'])[0] is None
+
+
+def test_commit_pins_mounted_state():
+    outer = App('outer')
+    inner = App('inner')
+
+    class User(object):
+        def __init__(self, username):
+            self.username = username
+
+    def configure(path):
+        c = setup()
+        c.configurable(outer)
+        c.configurable(inner)
+        c.action(outer.mount(path='sub', app=inner), lambda: {})
+        c.action(
+            inner.model(
+                path=path,
+                variables=lambda model: {'username': model.username}),
+            User)
+        c.action(inner.view(model=User),
+                 lambda request, model: request.link(model))
+        return c
+
+    configure('users/{username}').commit()
+
+    environ = EnvironBuilder('/sub/users/foo').get_environ()
+    request = outer.request(environ)
+    # a commit after the request started doesn't affect the mounted app
+    configure('people/{username}').commit()
+    response = publish(request, outer.mounted())
+    assert response.data == 'sub/users/foo'
+
+    cl = Client(outer, Response)
+    assert cl.get('/sub/users/foo').status == '404 NOT FOUND'
+    assert cl.get('/sub/people/foo').data == 'sub/people/foo'
+
+
+def test_freeze():
+
+    app = App()
+
+    class User(object):
+        def __init__(self, username):
+            self.username = username
+
+    c = setup()
+    c.configurable(app)
+    c.action(
+        app.model(
+            path='users/{username}',
+            variables=lambda model: {'username': model.username}),
+        User)
+    c.action(app.view(model=User), lambda request, model: request.link(model))
+    c.commit(freeze=True)
+
+    assert app.frozen
+    assert app.state.frozen
+    assert app.state.traject.trajects() == [app.state.traject]
+    assert app.lookup_cache_info()
+    with pytest.raises(ConfigError):
+        app.register('foo', [object], 'bar')
+
+    cl = Client(app, Response)
+    assert cl.get('/users/foo').data == 'users/foo'
+    assert cl.get('/users/foo/+foo').status == '404 NOT FOUND'
+
+    # committing again unfreezes the app
+    c.commit()
+    assert not app.frozen
+    app.register('foo', [object], 'bar')
+
+
+def test_lookup_cache_info():
+
+    app = App()
+    app.lookup_cache_size = 2
+
+    class Model(object):
+        pass
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Model)
+    c.action(app.view(model=Model), lambda request, model: 'root')
+    c.commit()
+
+    cl = Client(app, Response)
+    assert cl.get('/').data == 'root'
+    assert cl.get('/').data == 'root'
+    info = app.lookup_cache_info()
+    assert info[generic.view].misses == 1
+    assert info[generic.view].hits == 1
+    assert info[generic.view].size == 1
+
+    class_lookup = app.lookup().class_lookup
+    for i in range(3):
+        class_lookup.all(generic.view, [Request, type('Sub', (Model,), {})])
+    info = app.lookup_cache_info()
+    assert info[generic.view].size == 2
+    assert info[generic.view].evictions == 2
@@ -1,5 +1,10 @@
-from morepath.autosetup import morepath_packages, autoconfig, autosetup
+from morepath.autosetup import (morepath_packages, autoconfig, autosetup,
+                                DependencyMap, dist_packages,
+                                compile_packages)
 from base.m import app, get_foo
+import pkg_resources
+import sys
+import types
 
 
 def test_import():
@@ -10,6 +15,76 @@ def test_import():
                   key=lambda module: module.__name__) == [base, real, sub]
 
 
+def test_dist_packages():
+    ws = pkg_resources.working_set
+    assert list(dist_packages(ws.find(pkg_resources.Requirement.parse(
+        'base')))) == ['base']
+    assert list(dist_packages(ws.find(pkg_resources.Requirement.parse(
+        'ns')))) == ['ns.real']
+
+
+def fake_dist(tmpdir, metadata, packages):
+    egg_info = tmpdir.mkdir('fake-1.0.egg-info')
+    egg_info.join('PKG-INFO').write(
+        'Metadata-Version: 1.0\nName: fake\nVersion: 1.0\n')
+    for name, content in metadata.items():
+        egg_info.join(name).write(content)
+    for name in packages:
+        tmpdir.ensure(*(name.split('.') + ['__init__.py']))
+    tmpdir.ensure('module.py')
+    return pkg_resources.WorkingSet([str(tmpdir)]).find(
+        pkg_resources.Requirement.parse('fake'))
+
+
+def test_dist_packages_top_level(tmpdir):
+    dist = fake_dist(tmpdir, {'top_level.txt': 'a\nmodule\nmissing\n'},
+                     ['a', 'a.b', 'c'])
+    assert list(dist_packages(dist)) == ['a']
+
+
+def test_dist_packages_no_top_level(tmpdir):
+    dist = fake_dist(tmpdir, {}, ['a', 'a.b', 'c'])
+    assert list(dist_packages(dist)) == []
+
+
+def test_dist_packages_project_name(tmpdir):
+    # a develop install has no top_level.txt or list of installed files
+    dist = fake_dist(tmpdir, {}, ['a', 'fake'])
+    assert list(dist_packages(dist)) == ['fake']
+
+
+def test_dist_packages_record(tmpdir):
+    dist = fake_dist(tmpdir, {'RECORD': 'a/__init__.py,,\n'
+                              'a/b/__init__.py,,\n'
+                              'module.py,,\n'
+                              '../../bin/script,,\n'},
+                     ['a', 'a.b', 'c'])
+    assert list(dist_packages(dist)) == ['a']
+
+
+def test_dist_packages_installed_files(tmpdir):
+    dist = fake_dist(tmpdir, {'installed-files.txt': '../c/__init__.py\n'
+                              '../module.py\n'
+                              'PKG-INFO\n'},
+                     ['a', 'a.b', 'c'])
+    assert list(dist_packages(dist)) == ['c']
+
+
+def test_dist_packages_namespace(tmpdir):
+    dist = fake_dist(tmpdir, {'top_level.txt': 'a\n',
+                              'namespace_packages.txt': 'a\na.b\n'},
+                     ['a', 'a.b', 'a.b.c', 'a.d'])
+    assert sorted(dist_packages(dist)) == ['a.b.c', 'a.d']
+
+
+def test_dist_packages_entry_points(tmpdir):
+    dist = fake_dist(tmpdir, {'top_level.txt': 'a\nc\n',
+                              'entry_points.txt':
+                              '[morepath]\nscan = a.b\n'},
+                     ['a', 'a.b', 'c'])
+    assert list(dist_packages(dist)) == ['a.b']
+
+
 def test_autoconfig():
     c = autoconfig()
     c.commit()
@@ -18,8 +93,115 @@ def test_autoconfig():
     assert app.traject(['foo']) == (get_foo, [], {})
 
 
+def test_autoconfig_processes():
+    expected = [(type(action), obj) for action, obj in autoconfig().actions]
+    c = autoconfig(processes=2)
+    assert [(type(action), obj) for action, obj in c.actions] == expected
+    c.commit()
+    assert app.traject(['foo']) == (get_foo, [], {})
+
+
+def test_compile_packages(tmpdir, monkeypatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', False)
+    tmpdir.join('a.py').write('x = 1\n')
+    tmpdir.ensure('sub', 'b.py').write('y = 2\n')
+    tmpdir.join('broken.py').write('def\n')
+    package = types.ModuleType('package')
+    package.__path__ = [str(tmpdir)]
+    compile_packages([package], 2)
+    assert tmpdir.join('a.pyc').check()
+    assert tmpdir.join('sub', 'b.pyc').check()
+    assert not tmpdir.join('broken.pyc').check()
+
+
+def test_compile_packages_dont_write_bytecode(tmpdir, monkeypatch):
+    monkeypatch.setattr(sys, 'dont_write_bytecode', True)
+    tmpdir.join('a.py').write('x = 1\n')
+    package = types.ModuleType('package')
+    package.__path__ = [str(tmpdir)]
+    compile_packages([package], 2)
+    assert not tmpdir.join('a.pyc').check()
+
+
 def test_autosetup():
     autosetup()
     # a way to check whether model in base was registered, could
     # we make this a bit less low-level?
     assert app.traject(['foo']) == (get_foo, [], {})
+
+
+def working_set(tmpdir, requires):
+    for name, names in requires.items():
+        egg_info = tmpdir.mkdir('%s-1.0.egg-info' % name)
+        egg_info.join('PKG-INFO').write(
+            'Metadata-Version: 1.0\nName: %s\nVersion: 1.0\n' % name)
+        egg_info.join('requires.txt').write('\n'.join(names))
+    return pkg_resources.WorkingSet([str(tmpdir)])
+
+
+def test_dependency_map(tmpdir):
+    ws = working_set(tmpdir, {
+        'morepath': [],
+        'a': ['morepath'],
+        'b': ['a'],
+        'c': ['b', 'a'],
+        'd': [],
+        'e': ['d'],
+        })
+    m = DependencyMap(ws)
+    assert m.dependents('morepath') == set(['a', 'b', 'c'])
+    assert m.depends('c', 'morepath')
+    assert not m.depends('e', 'morepath')
+    assert not m.depends('morepath', 'morepath')
+    assert sorted(dist.project_name for dist in
+                  m.relevant_dists('morepath')) == ['a', 'b', 'c']
+
+
+def test_dependency_map_cycle(tmpdir):
+    ws = working_set(tmpdir, {
+        'morepath': [],
+        'a': ['morepath', 'b'],
+        'b': ['a'],
+        })
+    m = DependencyMap(ws)
+    assert m.dependents('morepath') == set(['a', 'b'])
+
+
+def test_dependency_map_deep(tmpdir):
+    requires = {'morepath': []}
+    previous = ['morepath']
+    for layer in range(30):
+        names = ['p%sx%s' % (layer, i) for i in range(3)]
+        for name in names:
+            requires[name] = previous
+        previous = names
+    m = DependencyMap(working_set(tmpdir, requires))
+    assert len(m.dependents('morepath')) == 90
+
+
+def test_dependency_map_cache(tmpdir):
+    ws = working_set(tmpdir.mkdir('dists'), {
+        'morepath': [],
+        'a': ['morepath'],
+        })
+    cache_path = str(tmpdir.join('dependencies.json'))
+    m = DependencyMap(ws, cache_path)
+    assert m.dependents('morepath') == set(['a'])
+
+    m = DependencyMap(ws, cache_path)
+    m.load = None
+    assert m.dependents('morepath') == set(['a'])
+
+
+def test_dependency_map_cache_other_working_set(tmpdir):
+    cache_path = str(tmpdir.join('dependencies.json'))
+    ws = working_set(tmpdir.mkdir('one'), {
+        'morepath': [],
+        'a': ['morepath'],
+        })
+    DependencyMap(ws, cache_path).dependents('morepath')
+    ws = working_set(tmpdir.mkdir('two'), {
+        'morepath': [],
+        'b': ['morepath'],
+        })
+    assert DependencyMap(ws, cache_path).dependents('morepath') == set(['b'])
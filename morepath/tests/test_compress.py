@@ -0,0 +1,165 @@
+import morepath
+from morepath import setup
+from morepath.compress import Compression, negotiate_encoding
+from morepath.request import Response
+from werkzeug.test import Client
+import gzip
+import zlib
+from StringIO import StringIO
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO(data)).read()
+
+
+def setup_app(compression=None, cacheable=False):
+    app = morepath.App()
+
+    class Root(object):
+        pass
+
+    def default(request, model):
+        return {'data': 'x' * 1000}
+
+    def small(request, model):
+        return {'data': 'x'}
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.json(model=Root, cacheable=cacheable), default)
+    c.action(app.json(model=Root, name='small'), small)
+    if compression is not None:
+        c.action(app.compression(), lambda: compression)
+    c.commit()
+    return app
+
+
+def test_no_compression_by_default():
+    app = setup_app()
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == '{"data": "%s"}' % ('x' * 1000)
+
+
+def test_gzip():
+    app = setup_app(Compression())
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert gunzip(response.data) == '{"data": "%s"}' % ('x' * 1000)
+
+
+def test_deflate():
+    app = setup_app(Compression())
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept-Encoding': 'deflate'})
+    assert response.headers['Content-Encoding'] == 'deflate'
+    assert (zlib.decompress(response.data) ==
+            '{"data": "%s"}' % ('x' * 1000))
+
+
+def test_not_accepted():
+    app = setup_app(Compression())
+
+    c = Client(app, Response)
+
+    response = c.get('/')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    response = c.get('/', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
+    response = c.get('/', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_vary_merged():
+    app = morepath.App()
+
+    class Root(object):
+        pass
+
+    def render(content):
+        response = Response(content)
+        response.headers['Vary'] = 'Cookie'
+        return response
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.view(model=Root, render=render),
+             lambda request, model: 'x' * 1000)
+    c.action(app.compression(), Compression)
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers.getlist('Vary') == ['Cookie, Accept-Encoding']
+
+
+def test_min_size():
+    app = setup_app(Compression(min_size=100))
+
+    c = Client(app, Response)
+
+    response = c.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == '{"data": "x"}'
+
+
+def test_cacheable():
+    compression = Compression()
+    app = setup_app(compression, cacheable=True)
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gunzip(response.data) == '{"data": "%s"}' % ('x' * 1000)
+    assert compression.cache.misses == 1
+    response = c.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gunzip(response.data) == '{"data": "%s"}' % ('x' * 1000)
+    assert compression.cache.hits == 1
+
+
+def test_not_cacheable():
+    compression = Compression()
+    app = setup_app(compression)
+
+    c = Client(app, Response)
+
+    c.get('/', headers={'Accept-Encoding': 'gzip'})
+    c.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compression.cache.lookups == 0
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding('gzip') == 'gzip'
+    assert negotiate_encoding('deflate, gzip;q=0.5') == 'deflate'
+    assert negotiate_encoding('*') == 'gzip'
+    assert negotiate_encoding('identity') is None
+
+
+def test_negotiate_encoding_refused():
+    assert negotiate_encoding('gzip;q=0') is None
+    assert negotiate_encoding('gzip;q=0, deflate') == 'deflate'
+    assert negotiate_encoding('*, gzip;q=0') == 'deflate'
+    assert negotiate_encoding('identity;q=1, *;q=0') is None
+    assert negotiate_encoding('*;q=0') is None
+
+
+def test_negotiate_encoding_identity():
+    assert negotiate_encoding('gzip, identity;q=0') == 'gzip'
+    assert negotiate_encoding('gzip;q=0.5') is None
+    assert negotiate_encoding('gzip;q=0.5, identity;q=0.1') == 'gzip'
+    assert negotiate_encoding('gzip;q=0.5, *;q=0.1') == 'gzip'
@@ -1,6 +1,7 @@
 from morepath import config
 from morepath.error import ConflictError
 import pytest
+import random
 
 
 def test_action():
@@ -309,6 +310,59 @@ def test_configurable_inherit_overriding():
     assert performed == [(x, one), (x, two), (y, two), (y, three)]
 
 
+def test_configurable_inherit_multiple_extends():
+    performed = []
+
+    class MyAction(config.Action):
+        def __init__(self, configurable, value):
+            super(MyAction, self).__init__(configurable)
+            self.value = value
+
+        def perform(self, configurable, obj):
+            performed.append((configurable, obj))
+
+        def identifier(self):
+            return 'action', self.value
+
+    c = config.Config()
+    base = config.Configurable()
+    left = config.Configurable(base)
+    right = config.Configurable(base)
+    bottom = config.Configurable([left, right])
+    for configurable in [base, left, right, bottom]:
+        c.configurable(configurable)
+
+    c.action(MyAction(base, 1), 'base1')
+    c.action(MyAction(base, 2), 'base2')
+    c.action(MyAction(base, 3), 'base3')
+    c.action(MyAction(right, 1), 'right1')
+    c.action(MyAction(right, 2), 'right2')
+    c.action(MyAction(left, 2), 'left2')
+    c.commit()
+
+    assert [obj for (configurable, obj) in performed
+            if configurable is bottom] == ['base1', 'base3', 'left2']
+    assert [obj for (configurable, obj) in performed
+            if configurable is right] == ['base3', 'right1', 'right2']
+
+
+def test_action_map():
+    base = config.ActionMap({'a': 'base a', 'b': 'base b'})
+    middle = config.ActionMap({'b': 'middle b'}, [base])
+    top = config.ActionMap({'c': 'top c'}, [middle, base])
+    assert top['a'] == 'base a'
+    assert top['b'] == 'middle b'
+    assert top['c'] == 'top c'
+    assert top.get('d') is None
+    assert 'a' in top
+    assert 'd' not in top
+    with pytest.raises(KeyError):
+        top['d']
+    assert len(top) == 3
+    assert sorted(top.items()) == [('a', 'base a'), ('b', 'middle b'),
+                                   ('c', 'top c')]
+
+
 def test_configurable_extra_discriminators():
     performed = []
 
@@ -417,3 +471,164 @@ def test_abbreviation():
     c.commit()
 
     assert performed == [(f1, 'blah', 'one'), (f2, 'blah', 'two')]
+
+
+class LogConfigurable(config.Configurable):
+    def clear(self):
+        super(LogConfigurable, self).clear()
+        self.log = []
+
+
+class LogAction(config.Action):
+    def __init__(self, configurable, key, priority=0):
+        super(LogAction, self).__init__(configurable)
+        self.key = key
+        self.priority = priority
+
+    def identifier(self):
+        return self.key
+
+    def perform(self, configurable, obj):
+        configurable.log.append((self.key, obj))
+
+
+def create_configurables():
+    a = LogConfigurable()
+    b = LogConfigurable(a)
+    c = LogConfigurable(b)
+    d = LogConfigurable([c, a])
+    e = LogConfigurable()
+    return [a, b, c, d, e]
+
+
+def create_actions(configurables, spec):
+    return [(LogAction(configurables[index], key, priority), obj)
+            for (index, key, priority, obj) in spec]
+
+
+def random_spec(r, size):
+    result = {}
+    for i in range(size):
+        index = r.randrange(5)
+        key = r.randrange(8)
+        result[index, key] = (index, key, r.choice([0, 0, 0, 1]),
+                              r.randrange(3))
+    return sorted(result.values(), key=lambda item: r.random())
+
+
+def test_incremental_commit_same_as_full_commit():
+    for seed in range(200):
+        r = random.Random(seed)
+        spec = random_spec(r, r.randrange(12))
+
+        configurables = create_configurables()
+        c = config.Config()
+        for configurable in configurables:
+            c.configurable(configurable)
+        for action, obj in create_actions(configurables, spec):
+            c.action(action, obj)
+        c.commit()
+
+        # remove, change and add actions
+        kept = []
+        for item, (action, obj) in zip(spec, c.actions):
+            choice = r.randrange(10)
+            if choice == 0:
+                continue
+            if choice == 1:
+                # changed in place, as with a rescan
+                item = item[:3] + (obj + 10,)
+                order = action.order
+                action, obj = create_actions(configurables, [item])[0]
+                action.order = order
+            elif choice == 2:
+                # replaced by an equal action, as with a rescan
+                order = action.order
+                action = create_actions(configurables, [item])[0][0]
+                action.order = order
+            kept.append((item, (action, obj)))
+        spec = [item for item, pair in kept]
+        c.actions = [pair for item, pair in kept]
+        used = set((index, key) for (index, key, priority, obj) in spec)
+        for item in random_spec(r, r.randrange(4)):
+            if item[:2] not in used:
+                spec.append(item)
+                c.action(*create_actions(configurables, [item])[0])
+        c.commit(incremental=True)
+
+        expected = create_configurables()
+        full = config.Config()
+        for configurable in expected:
+            full.configurable(configurable)
+        for action, obj in create_actions(expected, spec):
+            full.action(action, obj)
+        full.commit()
+
+        assert ([configurable.log for configurable in configurables] ==
+                [configurable.log for configurable in expected]), seed
+
+
+def test_incremental_commit_only_added():
+    a, b, c_, d, e = configurables = create_configurables()
+    c = config.Config()
+    for configurable in configurables:
+        c.configurable(configurable)
+    c.action(LogAction(a, 'one'), 1)
+    c.action(LogAction(e, 'two'), 2)
+    c.commit()
+    e_log = e.log
+    a_log = a.log
+
+    c.action(LogAction(a, 'three'), 3)
+    c.commit(incremental=True)
+    # e is unchanged, a only had an action added
+    assert e.log is e_log
+    assert a.log is a_log
+    assert a.log == [('one', 1), ('three', 3)]
+    assert d.log == [('one', 1), ('three', 3)]
+
+
+def test_incremental_commit_replaced_action():
+    a, b, c_, d, e = configurables = create_configurables()
+    c = config.Config()
+    for configurable in configurables:
+        c.configurable(configurable)
+    c.action(LogAction(a, 'one'), 1)
+    c.action(LogAction(e, 'two'), 2)
+    c.commit()
+    a_log = a.log
+    e_log = e.log
+
+    # an equal action for the same object is not a change
+    c.actions[0] = LogAction(a, 'one'), 1
+    c.actions[0][0].order = 0
+    c.commit(incremental=True)
+    assert a.log is a_log
+
+    # a changed action is, and a is committed again
+    c.actions[0] = LogAction(a, 'one'), 3
+    c.actions[0][0].order = 0
+    c.commit(incremental=True)
+    assert a.log is not a_log
+    assert a.log == [('one', 3)]
+    assert d.log == [('one', 3)]
+    assert e.log is e_log
+
+
+def test_incremental_commit_conflict():
+    a = config.Configurable()
+    c = config.Config()
+    c.configurable(a)
+
+    class MyAction(config.Action):
+        def perform(self, configurable, obj):
+            pass
+
+        def identifier(self):
+            return ()
+
+    c.action(MyAction(a), 1)
+    c.commit()
+    c.action(MyAction(a), 2)
+    with pytest.raises(ConflictError):
+        c.commit(incremental=True)
@@ -1,6 +1,7 @@
 from .fixtures import basic, nested, abbr, mapply_bug
 from morepath import setup
-from morepath.error import ConflictError
+from morepath.error import ConflictError, ConfigError
+from morepath.model import MountContextCache, MountPool
 from morepath.config import Config
 from morepath.request import Response
 from morepath.view import render_html
@@ -785,6 +786,262 @@ def test_mount_context_standalone():
     assert response.data == 'The root for mount id: foo'
 
 
+def test_mount_context_cache():
+    app = morepath.App('app')
+    mounted = morepath.App('mounted')
+    cache = MountContextCache()
+    calls = []
+
+    class MountedRoot(object):
+        def __init__(self, mount_id):
+            self.mount_id = mount_id
+
+    def root_default(request, model):
+        return "The root for mount id: %s" % model.mount_id
+
+    def get_context(id):
+        calls.append(id)
+        return {
+            'mount_id': id
+            }
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(mounted)
+    c.action(app.mount(path='{id}', app=mounted, cache=cache), get_context)
+    c.action(mounted.root(), MountedRoot)
+    c.action(mounted.view(model=MountedRoot), root_default)
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo')
+    assert response.data == 'The root for mount id: foo'
+    response = c.get('/foo')
+    assert response.data == 'The root for mount id: foo'
+    response = c.get('/bar')
+    assert response.data == 'The root for mount id: bar'
+    assert calls == ['foo', 'bar']
+    # consuming the mount does not change the cached context
+    assert cache.get({'id': 'foo'}) == {'mount_id': 'foo'}
+
+    cache.invalidate(id='foo')
+    c.get('/foo')
+    c.get('/bar')
+    assert calls == ['foo', 'bar', 'foo']
+    cache.invalidate()
+    c.get('/bar')
+    assert calls == ['foo', 'bar', 'foo', 'bar']
+
+
+def test_mount_context_cache_unhashable():
+    outer = morepath.App('outer')
+    middle = morepath.App('middle')
+    inner = morepath.App('inner')
+    calls = []
+
+    class Root(object):
+        pass
+
+    def get_context(id, tags):
+        calls.append(id)
+        return {'mount_id': id, 'tags': tags}
+
+    c = setup()
+    c.configurable(outer)
+    c.configurable(middle)
+    c.configurable(inner)
+    c.action(outer.mount(path='m', app=middle), lambda: {'tags': ['a']})
+    c.action(middle.mount(path='{id}', app=inner,
+                          cache=MountContextCache()), get_context)
+    c.action(inner.root(), Root)
+    c.action(inner.view(model=Root), lambda request, model: 'root')
+    c.commit()
+
+    c = Client(outer, Response)
+
+    assert c.get('/m/foo').data == 'root'
+    assert c.get('/m/foo').data == 'root'
+    assert calls == ['foo', 'foo']
+
+
+def test_mount_context_cache_timeout():
+    cache = MountContextCache(size=2, timeout=0)
+    cache.put({'id': 'foo'}, {'mount_id': 'foo'})
+    assert cache.get({'id': 'foo'}) is None
+    cache = MountContextCache(size=2)
+    cache.put({'id': 'foo'}, {'mount_id': 'foo'})
+    cache.put({'id': 'bar'}, {'mount_id': 'bar'})
+    cache.put({'id': 'baz'}, {'mount_id': 'baz'})
+    assert cache.get({'id': 'foo'}) is None
+    assert cache.get({'id': 'baz'}) == {'mount_id': 'baz'}
+
+
+def test_mount_pool():
+    app = morepath.App('app')
+    mounted = morepath.App('mounted')
+    pool = MountPool(size=2)
+    calls = []
+    mounts = []
+
+    class MountedRoot(object):
+        pass
+
+    def root_default(request, model):
+        mounts.append(request.mounts[-1])
+        return "%s: %s" % (request.mounts[-1].create_context()['mount_id'],
+                           request.link(model))
+
+    def get_context(id):
+        calls.append(id)
+        return {
+            'mount_id': id
+            }
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(mounted)
+    c.action(app.mount(path='{id}', app=mounted, pool=pool,
+                       cache=MountContextCache()), get_context)
+    c.action(mounted.root(), MountedRoot)
+    c.action(mounted.view(model=MountedRoot), root_default)
+    c.commit()
+
+    c = Client(app, Response)
+
+    assert c.get('/foo').data == 'foo: foo'
+    assert c.get('/foo').data == 'foo: foo'
+    assert c.get('/bar').data == 'bar: bar'
+    assert calls == ['foo', 'bar']
+    assert mounts[0] is mounts[1]
+    assert mounts[0] is not mounts[2]
+    assert mounts[0].variables == {'id': 'foo'}
+    # the pool is bounded
+    c.get('/baz')
+    c.get('/foo')
+    assert mounts[-1] is not mounts[0]
+    pool.invalidate(id='foo')
+    c.get('/foo')
+    assert mounts[-1] is not mounts[-2]
+    pool.invalidate()
+    assert pool.cache.data == {}
+
+
+def test_mount_pool_unhashable():
+    outer = morepath.App('outer')
+    middle = morepath.App('middle')
+    inner = morepath.App('inner')
+    pool = MountPool()
+    mounts = []
+
+    class Root(object):
+        pass
+
+    def root_default(request, model):
+        mounts.append(request.mounts[-1])
+        return request.mounts[-1].create_context()['tags'][0]
+
+    c = setup()
+    c.configurable(outer)
+    c.configurable(middle)
+    c.configurable(inner)
+    c.action(outer.mount(path='m', app=middle), lambda: {'tags': ['a']})
+    c.action(middle.mount(path='{id}', app=inner, pool=pool),
+             lambda id, tags: {'tags': tags})
+    c.action(inner.root(), Root)
+    c.action(inner.view(model=Root), root_default)
+    c.commit()
+
+    c = Client(outer, Response)
+
+    assert c.get('/m/foo').data == 'a'
+    assert c.get('/m/foo').data == 'a'
+    assert mounts[0] is not mounts[1]
+    assert pool.cache.data == {}
+
+
+def test_mount_pool_request_context():
+    app = morepath.App('app')
+    mounted = morepath.App('mounted')
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(mounted)
+    c.action(app.mount(path='{id}', app=mounted, pool=MountPool()),
+             lambda id, request: {})
+    with pytest.raises(ConfigError):
+        c.commit()
+
+
+def test_mount_nested_link():
+    outer = morepath.App('outer')
+    middle = morepath.App('middle')
+    inner = morepath.App('inner')
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    def link(request, model):
+        return request.link(model)
+
+    c = setup()
+    c.configurable(outer)
+    c.configurable(middle)
+    c.configurable(inner)
+    c.action(outer.mount(path='m/{a}', app=middle), lambda a: {})
+    c.action(middle.mount(path='i/{b}', app=inner), lambda b: {})
+    c.action(inner.model(path='{id}',
+                         variables=lambda model: {'id': model.id}),
+             Model)
+    c.action(inner.view(model=Model), link)
+    c.commit()
+
+    c = Client(outer, Response)
+    assert c.get('/m/x/i/y/foo').data == 'm/x/i/y/foo'
+    assert len(outer.state.mount_paths.data) == 1
+    assert len(middle.state.mount_paths.data) == 1
+    assert c.get('/m/x/i/y/bar').data == 'm/x/i/y/bar'
+    assert len(middle.state.mount_paths.data) == 1
+    assert c.get('/m/x/i/z/foo').data == 'm/x/i/z/foo'
+    assert len(outer.state.mount_paths.data) == 1
+    assert len(middle.state.mount_paths.data) == 2
+
+
+def test_mount_link_uses_pinned_state():
+    outer = morepath.App('outer')
+    inner = morepath.App('inner')
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    def configure(path, swap_config=None):
+        c = setup()
+        c.configurable(outer)
+        c.configurable(inner)
+        c.action(outer.mount(path=path, app=inner), lambda a: {})
+        c.action(inner.model(path='{id}',
+                             variables=lambda model: {'id': model.id}),
+                 Model)
+
+        def view(request, model):
+            if swap_config is not None:
+                swap_config.commit()
+            return request.link(model)
+
+        c.action(inner.view(model=Model), view)
+        return c
+
+    new_config = configure('n/{a}')
+    old_config = configure('m/{a}', new_config)
+    old_config.commit()
+
+    c = Client(outer, Response)
+    assert c.get('/m/x/foo').data == 'm/x/foo'
+    assert c.get('/n/x/foo').data == 'n/x/foo'
+
+
 def test_mapply_bug():
     config = setup()
     config.scan(mapply_bug)
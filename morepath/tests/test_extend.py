@@ -1,4 +1,4 @@
-from morepath.app import App
+from morepath.app import App, global_app
 from werkzeug.test import Client
 from morepath import setup
 from morepath.request import Response
@@ -150,3 +150,243 @@ def test_overrides_model():
     assert response.status == '404 NOT FOUND'
     response = cl.get('/users/bar')
     assert response.data == 'User: bar'
+
+
+def test_extends_does_not_copy_registrations():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    class User(object):
+        def __init__(self, username):
+            self.username = username
+
+    c.action(
+        app.model(
+            path='users/{username}',
+            variables=lambda model: {'username': model.username}),
+        User)
+
+    def render_user(request, model):
+        return "User: %s" % model.username
+
+    c.action(
+        app.view(
+            model=User),
+        render_user)
+
+    c.commit()
+
+    assert app._d
+    assert extending._d == {}
+    assert extending.traject.is_empty()
+    assert extending.registries()[:2] == [extending, app]
+
+    cl = Client(extending, Response)
+    response = cl.get('/users/foo')
+    assert response.data == 'User: foo'
+
+
+def test_extends_view_predicates_and_links():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    class User(object):
+        def __init__(self, username):
+            self.username = username
+
+    class Group(object):
+        def __init__(self, name):
+            self.name = name
+
+    c.action(
+        app.model(
+            path='users/{username}',
+            variables=lambda model: {'username': model.username}),
+        User)
+    c.action(
+        extending.model(
+            path='groups/{name}',
+            variables=lambda model: {'name': model.name}),
+        Group)
+
+    def render_user(request, model):
+        return "User: %s" % model.username
+
+    c.action(app.view(model=User), render_user)
+
+    def render_user_post(request, model):
+        return "Posted: %s" % model.username
+
+    c.action(app.view(model=User, request_method='POST'),
+             render_user_post)
+
+    def link_user(request, model):
+        return request.link(User('bar'))
+
+    c.action(extending.view(model=User, name='link'), link_user)
+
+    def render_group(request, model):
+        return request.link(User(model.name))
+
+    c.action(extending.view(model=Group), render_group)
+
+    c.commit()
+
+    cl = Client(extending, Response)
+    assert cl.get('/users/foo').data == 'User: foo'
+    assert cl.post('/users/foo').data == 'Posted: foo'
+    assert cl.get('/users/foo/link').data == 'users/bar'
+    assert cl.get('/groups/foo').data == 'users/foo'
+
+    cl = Client(app, Response)
+    assert cl.get('/users/foo/link').status == '404 NOT FOUND'
+    assert cl.get('/groups/foo').status == '404 NOT FOUND'
+
+
+def test_extends_predicate_does_not_change_extended():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    c.action(extending.predicate(name='extra', order=10, default=None),
+             lambda request, model: None)
+    c.commit()
+
+    assert 'extra' in [predicate.name for (order, predicate) in
+                       extending.get('predicate_info', ())]
+    assert 'extra' not in [predicate.name for (order, predicate) in
+                           app.get('predicate_info', ())]
+
+
+def test_extends_predicate_with_extended_view():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    class Model(object):
+        pass
+
+    class Sub(Model):
+        pass
+
+    c.action(app.root(), Sub)
+    c.action(app.view(model=Sub, name='other'),
+             lambda request, model: 'other')
+    c.action(extending.predicate(name='extra', order=10, default=None),
+             lambda request, model: request.args.get('extra'))
+    c.action(extending.view(model=Model, extra='x'),
+             lambda request, model: 'extra')
+    c.commit()
+
+    cl = Client(extending, Response)
+    response = cl.get('/?extra=x')
+    assert response.data == 'extra'
+    response = cl.get('/?extra=y')
+    assert response.status == '404 NOT FOUND'
+    response = cl.get('/other')
+    assert response.data == 'other'
+
+
+def test_extends_view_precedence():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    class Root(object):
+        pass
+
+    c.action(app.root(), Root)
+    c.action(app.view(model=Root, request_method='POST'),
+             lambda request, model: 'app post')
+    c.action(app.view(model=Root, request_method='PUT',
+                      accept='application/json'),
+             lambda request, model: 'app put json')
+    c.action(extending.view(model=Root),
+             lambda request, model: 'extending any')
+    c.action(extending.view(model=Root, request_method='PUT'),
+             lambda request, model: 'extending put')
+    c.commit()
+
+    cl = Client(extending, Response)
+    assert cl.get('/').data == 'extending any'
+    assert cl.post('/').data == 'app post'
+    assert cl.put('/').data == 'extending put'
+    assert cl.put(
+        '/', headers={'Accept': 'application/json'}).data == 'app put json'
+
+
+def test_extends_view_overrides():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    class Root(object):
+        pass
+
+    c.action(app.root(), Root)
+    c.action(app.view(model=Root),
+             lambda request, model: 'app')
+    c.action(app.view(model=Root, request_method='POST'),
+             lambda request, model: 'app post')
+    c.action(extending.view(model=Root, request_method='POST'),
+             lambda request, model: 'extending post')
+    c.commit()
+
+    cl = Client(extending, Response)
+    assert cl.get('/').data == 'app'
+    assert cl.post('/').data == 'extending post'
+    cl = Client(app, Response)
+    assert cl.post('/').data == 'app post'
+
+
+def test_incremental_commit():
+    app = App()
+    extending = App(extends=[app])
+
+    c = setup()
+    c.configurable(app)
+    c.configurable(extending)
+
+    class User(object):
+        def __init__(self, username):
+            self.username = username
+
+    c.action(
+        app.model(
+            path='users/{username}',
+            variables=lambda model: {'username': model.username}),
+        User)
+    c.action(app.view(model=User), lambda request, model: 'User')
+    c.commit()
+
+    global_registrations = global_app._d
+    cl = Client(extending, Response)
+    assert cl.get('/users/foo/edit').status == '404 NOT FOUND'
+
+    c.action(app.view(model=User, name='edit'),
+             lambda request, model: 'Edit')
+    c.commit(incremental=True)
+
+    assert global_app._d is global_registrations
+    assert cl.get('/users/foo').data == 'User'
+    assert cl.get('/users/foo/edit').data == 'Edit'
@@ -0,0 +1,42 @@
+from morepath.lookupcache import LRUClassLookup, CacheInfo
+
+
+class CountingLookup(object):
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key, classes):
+        self.calls += 1
+        return None
+
+    def all(self, key, classes):
+        self.calls += 1
+        return iter([key, classes])
+
+
+def test_lru_class_lookup():
+    counting = CountingLookup()
+    lookup = LRUClassLookup(counting, size=2)
+    assert lookup.get('a', [int]) is None
+    assert lookup.get('a', [int]) is None
+    assert counting.calls == 1
+    assert lookup.all('a', [int]) == ['a', (int,)]
+    assert lookup.all('a', [int]) == ['a', (int,)]
+    assert counting.calls == 2
+    assert lookup.info() == {'a': CacheInfo(2, 2, 0, 2)}
+
+
+def test_lru_class_lookup_evicts_per_key():
+    counting = CountingLookup()
+    lookup = LRUClassLookup(counting, size=2)
+    lookup.get('a', [int])
+    lookup.get('a', [str])
+    lookup.get('a', [float])
+    lookup.get('b', [int])
+    info = lookup.info()
+    assert info['a'] == CacheInfo(0, 3, 1, 2)
+    assert info['b'] == CacheInfo(0, 1, 0, 1)
+    lookup.get('a', [int])
+    assert counting.calls == 5
+    lookup.clear()
+    assert lookup.info() == {}
@@ -0,0 +1,179 @@
+import morepath
+from morepath import setup, generic
+from morepath.metrics import Metrics, Histogram
+from morepath.request import Request, Response
+from werkzeug.exceptions import NotFound
+from werkzeug.test import Client
+
+
+class Root(object):
+    pass
+
+
+class Model(object):
+    def __init__(self, id):
+        self.id = id
+
+
+def setup_app(*actions):
+    app = morepath.App()
+
+    def get_model(id):
+        return Model(id)
+
+    def default(request, model):
+        return "Model: %s" % model.id
+
+    def edit(request, model):
+        return {'id': model.id}
+
+    def metrics(request, model):
+        return app.metrics.view(request, model)
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.model(model=Model, path='{id}',
+                       variables=lambda model: {'id': model.id}),
+             get_model)
+    c.action(app.view(model=Model), default)
+    c.action(app.json(model=Model, name='edit', request_method='POST'),
+             edit)
+    c.action(app.view(model=Root, name='metrics'), metrics)
+    for action in actions:
+        action(c, app)
+    c.commit()
+    return app
+
+
+def test_no_metrics_by_default():
+    app = setup_app()
+    assert app.metrics is None
+
+    c = Client(app, Response)
+
+    response = c.get('/foo')
+    assert response.data == 'Model: foo'
+
+
+def test_metrics():
+    app = setup_app()
+    app.metrics = metrics = Metrics()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo')
+    assert response.data == 'Model: foo'
+    c.get('/bar')
+    c.post('/foo/edit')
+    c.get('/foo/edit')
+
+    model = 'morepath.tests.test_metrics.Model'
+    assert metrics.counter('morepath_requests_total', method='GET',
+                           model=model, view='', status=200) == 2
+    assert metrics.counter('morepath_requests_total', method='POST',
+                           model=model, view='edit', status=200) == 1
+    assert metrics.counter('morepath_requests_total', method='GET',
+                           model=model, view='<unmatched>', status=404) == 1
+    for phase in ['resolve', 'identity', 'permission', 'view', 'render']:
+        histogram = metrics.histogram(
+            'morepath_phase_seconds', method='GET', model=model,
+            view='', phase=phase)
+        assert histogram.count == 2
+    assert metrics.histogram(
+        'morepath_phase_seconds', method='GET', model=model,
+        view='<unmatched>', phase='view') is None
+
+
+def test_metrics_unmatched():
+    app = setup_app()
+    app.metrics = metrics = Metrics()
+
+    c = Client(app, Response)
+
+    for i in range(20):
+        c.get('/foo/junk%s' % i)
+        c.get('/foo/junk/%s' % i)
+        c.open('/foo', method='JUNK%s' % i)
+
+    model = 'morepath.tests.test_metrics.Model'
+    assert metrics.counter('morepath_requests_total', method='GET',
+                           model=model, view='<unmatched>', status=404) == 40
+    assert metrics.counter('morepath_requests_total', method='<other>',
+                           model=model, view='', status=200) == 20
+    assert len(metrics._counters) == 2
+
+
+def test_metrics_view_not_found():
+    def missing(request, model):
+        raise NotFound()
+
+    def add_view(c, app):
+        c.action(app.view(model=Model, name='missing'), missing)
+
+    app = setup_app(add_view)
+    app.metrics = metrics = Metrics()
+
+    c = Client(app, Response)
+
+    assert c.get('/foo/missing').status_code == 404
+    model = 'morepath.tests.test_metrics.Model'
+    # the view was found, so the request is not unmatched
+    assert metrics.counter('morepath_requests_total', method='GET',
+                           model=model, view='missing', status=404) == 1
+
+
+def test_metrics_exposition():
+    app = setup_app()
+    app.metrics = Metrics(buckets=[0.5, 1.0])
+
+    c = Client(app, Response)
+
+    c.get('/foo')
+    response = c.get('/+metrics')
+    assert response.content_type == 'text/plain; version=0.0.4'
+    lines = response.data.split('\n')
+    assert lines[0] == '# TYPE morepath_requests_total counter'
+    assert lines[1] == (
+        'morepath_requests_total{method="GET",'
+        'model="morepath.tests.test_metrics.Model",'
+        'status="200",view=""} 1')
+    assert '# TYPE morepath_phase_seconds histogram' in lines
+    assert ('morepath_phase_seconds_bucket{method="GET",'
+            'model="morepath.tests.test_metrics.Model",'
+            'phase="view",view="",le="+Inf"} 1') in lines
+    assert ('morepath_phase_seconds_count{method="GET",'
+            'model="morepath.tests.test_metrics.Model",'
+            'phase="view",view=""} 1') in lines
+
+
+def test_histogram():
+    histogram = Histogram((1, 2, 3))
+    histogram.observe(0.5)
+    histogram.observe(1)
+    histogram.observe(2.5)
+    histogram.observe(10)
+    assert histogram.count == 4
+    assert histogram.sum == 14.0
+    assert histogram.cumulative() == [
+        (1, 2), (2, 2), (3, 3), (float('inf'), 4)]
+
+
+def test_metrics_custom_response():
+    def custom_response(c, app):
+        c.action(app.function(generic.response, Request, Model),
+                 lambda request, model: Response('custom'))
+
+    app = setup_app(custom_response)
+    app.metrics = metrics = Metrics()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo')
+    assert response.data == 'custom'
+    model = 'morepath.tests.test_metrics.Model'
+    assert metrics.counter('morepath_requests_total', method='GET',
+                           model=model, view='', status=200) == 1
+    assert metrics.histogram(
+        'morepath_phase_seconds', method='GET', model=model,
+        view='', phase='resolve').count == 1
@@ -1,6 +1,11 @@
 from morepath.app import App
 from morepath import setup
 from morepath.request import Response
+from morepath.view import negotiate_content_type, accept_quality
+from morepath.request import Request
+from morepath import generic
+from werkzeug.http import parse_accept_header
+from werkzeug.datastructures import MIMEAccept
 from werkzeug.test import Client
 
 
@@ -66,3 +71,191 @@ def test_extra_predicates():
     assert response.data == 'a'
     response = c.post('/b/foo')
     assert response.data == 'b'
+
+
+def test_predicates_calculated_lazily():
+    app = App()
+
+    class Root(object):
+        pass
+
+    calculated = []
+
+    def get_header(request, model):
+        calculated.append(request.view_name)
+        return request.headers.get('X-Foo', '')
+
+    def foo(request, model):
+        return 'foo'
+
+    def bar_a(request, model):
+        return 'bar a'
+
+    def bar_b(request, model):
+        return 'bar b'
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.predicate(name='header', order=2, default=''),
+             get_header)
+    c.action(app.view(model=Root, name='foo'), foo)
+    c.action(app.view(model=Root, name='bar', header='a'), bar_a)
+    c.action(app.view(model=Root, name='bar', header='b'), bar_b)
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo', headers={'X-Foo': 'a'})
+    assert response.data == 'foo'
+    assert calculated == []
+    response = c.get('/qux')
+    assert response.status == '404 NOT FOUND'
+    assert calculated == []
+    response = c.get('/bar', headers={'X-Foo': 'b'})
+    assert response.data == 'bar b'
+    assert calculated == ['bar']
+
+
+def test_predicates_memoized_on_request():
+    app = App()
+
+    class Base(object):
+        pass
+
+    class Sub(Base):
+        pass
+
+    calculated = []
+
+    def get_header(request, model):
+        calculated.append(model)
+        return request.headers.get('X-Foo', '')
+
+    def base_view(request, model):
+        return 'base'
+
+    def sub_view(request, model):
+        return 'sub'
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Sub)
+    c.action(app.predicate(name='header', order=2, default=''),
+             get_header)
+    c.action(app.view(model=Base, header='a'), base_view)
+    c.action(app.view(model=Sub, header='b'), sub_view)
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'X-Foo': 'a'})
+    assert response.data == 'base'
+    assert len(calculated) == 1
+
+
+def test_accept_predicate():
+    app = App()
+
+    class Root(object):
+        pass
+
+    def json_view(request, model):
+        return {'format': 'json'}
+
+    def html_view(request, model):
+        return '<p>html</p>'
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.json(model=Root, accept='application/json'), json_view)
+    c.action(app.html(model=Root, accept='text/html'), html_view)
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept': 'application/json'})
+    assert response.data == '{"format": "json"}'
+    response = c.get('/', headers={'Accept': 'text/html'})
+    assert response.data == '<p>html</p>'
+    response = c.get(
+        '/', headers={'Accept': 'text/html;q=0.5, application/json'})
+    assert response.data == '{"format": "json"}'
+    response = c.get('/')
+    assert response.data == '<p>html</p>'
+    assert response.headers['Vary'] == 'Accept'
+    response = c.get('/', headers={'Accept': 'image/png'})
+    assert response.status == '404 NOT FOUND'
+    response = c.get('/', headers={'Accept': 'text/html;q=0, */*'})
+    assert response.data == '{"format": "json"}'
+
+
+def test_accept_predicate_not_calculated():
+    app = App()
+
+    class Root(object):
+        pass
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.view(model=Root), lambda request, model: 'any')
+    c.action(app.json(model=Root, name='data', accept='application/json'),
+             lambda request, model: {})
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/', headers={'Accept': 'application/json'})
+    assert response.data == 'any'
+    assert 'Vary' not in response.headers
+    response = c.get('/data', headers={'Accept': 'application/json'})
+    assert response.data == '{}'
+    assert response.headers['Vary'] == 'Accept'
+
+
+def test_predicate_order():
+    app = App()
+
+    class Root(object):
+        pass
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.predicate(name='first', order=-1, default=''),
+             lambda request, model: '')
+    c.action(app.predicate(name='last', order=2, default=''),
+             lambda request, model: '')
+    c.action(app.view(model=Root), lambda request, model: '')
+    c.commit()
+
+    matcher = app.exact(generic.view, (Request, Root))
+    assert [predicate.name for predicate in matcher._predicates] == [
+        'first', 'name', 'request_method', 'accept', 'last']
+
+
+def test_negotiate_content_type():
+    assert negotiate_content_type(None) == 'text/html'
+    assert negotiate_content_type('*/*') == 'text/html'
+    assert negotiate_content_type('application/*') == 'application/json'
+    assert negotiate_content_type('image/png') is None
+    # cached result is the same
+    assert negotiate_content_type('application/*') == 'application/json'
+    assert negotiate_content_type('text/html;q=0, */*') == 'application/json'
+    assert negotiate_content_type('*/*, text/html;q=0') == 'application/json'
+    assert negotiate_content_type('text/*;q=0, */*;q=0.5') == (
+        'application/json')
+    assert negotiate_content_type('*/*;q=0') is None
+
+
+def test_accept_quality():
+    accept = parse_accept_header(
+        'text/html;q=0.5, text/*;q=0.2, application/json;q=0, */*;q=0.1',
+        MIMEAccept)
+    assert accept_quality(accept, 'text/html') == 0.5
+    assert accept_quality(accept, 'text/plain') == 0.2
+    assert accept_quality(accept, 'application/json') == 0
+    assert accept_quality(accept, 'image/png') == 0.1
+    assert accept_quality(parse_accept_header('Gzip'), 'gzip') == 1
+    assert accept_quality(parse_accept_header('deflate'), 'gzip') == 0
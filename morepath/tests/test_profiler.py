@@ -0,0 +1,132 @@
+import morepath
+from morepath import setup
+from morepath.metrics import Metrics
+from morepath.profiler import Profiler
+from morepath.request import Response
+from werkzeug.test import Client
+import pstats
+import pytest
+
+
+class Root(object):
+    pass
+
+
+class Model(object):
+    def __init__(self, id):
+        self.id = id
+
+
+def model_view(request, model):
+    return "Model: %s" % model.id
+
+
+def root_view(request, model):
+    return "Root"
+
+
+def setup_app():
+    app = morepath.App()
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.model(path='{id}',
+                       variables=lambda model: {'id': model.id}),
+             Model)
+    c.action(app.view(model=Model), model_view)
+    c.action(app.view(model=Root), root_view)
+    c.commit()
+    return app
+
+
+def profiled_functions(stats):
+    return set([func for (filename, lineno, func) in stats.stats])
+
+
+def test_profiler_rate():
+    app = setup_app()
+    app.profiler = profiler = Profiler(rate=2)
+
+    c = Client(app, Response)
+
+    for i in range(5):
+        response = c.get('/foo')
+        assert response.data == 'Model: foo'
+    assert profiler.samples == 2
+    assert 'model_view' in profiled_functions(profiler.stats)
+
+
+def test_profiler_invalid_rate():
+    with pytest.raises(ValueError):
+        Profiler(rate=0)
+
+
+def test_profiler_predicate():
+    app = setup_app()
+    app.profiler = profiler = Profiler(
+        predicate=lambda request, model: isinstance(model, Root))
+
+    c = Client(app, Response)
+
+    c.get('/foo')
+    assert profiler.samples == 0
+    assert profiler.stats is None
+    response = c.get('/')
+    assert response.data == 'Root'
+    assert profiler.samples == 1
+    functions = profiled_functions(profiler.stats)
+    assert 'root_view' in functions
+    assert 'model_view' not in functions
+
+
+def test_profiler_with_metrics():
+    app = setup_app()
+    app.profiler = profiler = Profiler()
+    app.metrics = metrics = Metrics()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo')
+    assert response.data == 'Model: foo'
+    assert profiler.samples == 1
+    assert 'model_view' in profiled_functions(profiler.stats)
+    model = 'morepath.tests.test_profiler.Model'
+    assert metrics.counter('morepath_requests_total', method='GET',
+                           model=model, view='', status=200) == 1
+    assert metrics.histogram(
+        'morepath_phase_seconds', method='GET', model=model,
+        view='', phase='view').count == 1
+
+
+def test_profiler_not_found():
+    app = setup_app()
+    app.profiler = profiler = Profiler()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo/bar/baz')
+    assert response.status == '404 NOT FOUND'
+    assert profiler.samples == 1
+
+
+def test_profiler_dump(tmpdir):
+    app = setup_app()
+    app.profiler = profiler = Profiler(directory=str(tmpdir))
+
+    assert profiler.dump() is None
+
+    c = Client(app, Response)
+
+    c.get('/foo')
+    path = profiler.dump()
+    assert 'model_view' in profiled_functions(pstats.Stats(path))
+    profiler.clear()
+    assert profiler.samples == 0
+    assert profiler.stats is None
+
+
+def test_profiler_dump_without_directory():
+    profiler = Profiler()
+    with pytest.raises(ValueError):
+        profiler.dump()
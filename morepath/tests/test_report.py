@@ -0,0 +1,47 @@
+import json
+import morepath
+from morepath.report import CommitReport, main
+from .fixtures import basic
+
+
+def test_commit_report():
+    config = morepath.setup()
+    config.scan(basic)
+    report = CommitReport(top=3)
+    config.commit(report=report)
+
+    assert [info['name'] for info in report.phases] == [
+        'clear', 'prepared', 'prepare', 'perform', 'activate']
+    for info in report.phases:
+        assert info['seconds'] >= 0
+
+    assert report.directives['ViewDirective']['count'] == 5
+    assert report.directives['ModelDirective']['count'] == 1
+    assert report.configurables['global_app'] > 0
+    assert len(report.slowest) == 3
+    seconds = [info['seconds'] for info in report.slowest]
+    assert seconds == sorted(seconds, reverse=True)
+    assert all(info['codeinfo'] is not None for info in report.slowest)
+
+    text = report.format()
+    assert 'Slowest actions:' in text
+    assert 'ViewDirective' in text
+    json.dumps(report.as_dict())
+
+
+def test_commit_report_incremental():
+    config = morepath.setup()
+    config.scan(basic)
+    config.commit()
+    report = CommitReport()
+    config.commit(incremental=True, report=report)
+    assert [info['name'] for info in report.phases] == ['incremental']
+    assert report.directives == {}
+
+
+def test_commit_report_cli(capsys):
+    main(['morepath.tests.fixtures.basic', '--json', '--top', '2'])
+    out, err = capsys.readouterr()
+    data = json.loads(out)
+    assert data['phases'][0]['name'] == 'scan'
+    assert len(data['slowest']) == 2
@@ -0,0 +1,163 @@
+import os
+import sys
+import morepath
+from morepath.config import Config
+from morepath.scancache import ScanCache
+from morepath.request import Response
+from morepath.tests.fixtures import basic
+from werkzeug.test import Client
+import pytest
+
+
+@pytest.fixture
+def package_dir(tmpdir):
+    root = tmpdir.mkdir('scanned')
+    pkg = root.mkdir('scancachepkg')
+    pkg.join('__init__.py').write('')
+    pkg.join('app.py').write(
+        'import morepath\n'
+        'app = morepath.App()\n')
+    pkg.join('views.py').write(
+        'from .app import app\n'
+        '@app.root()\n'
+        'class Root(object):\n'
+        '    pass\n'
+        '@app.view(model=Root)\n'
+        'def default(self, request):\n'
+        '    return "root"\n')
+    pkg.join('plain.py').write('x = 1\n')
+    sub = pkg.mkdir('sub')
+    sub.join('__init__.py').write('')
+    sub.join('helpers.py').write('y = 2\n')
+    sys.path.insert(0, str(root))
+    yield pkg
+    sys.path.remove(str(root))
+    forget_modules()
+
+
+def forget_modules():
+    for name in list(sys.modules):
+        if name.split('.')[0] == 'scancachepkg':
+            del sys.modules[name]
+
+
+def scan(cache):
+    import scancachepkg
+    config = Config(cache)
+    config.scan(scancachepkg)
+    return config
+
+
+def test_scan_cache_records_configured_modules(tmpdir, package_dir):
+    cache = ScanCache(str(tmpdir.join('scan.json')))
+    config = scan(cache)
+    assert len(config.configurables) == 1
+    assert len(config.actions) == 2
+    entry = ScanCache(cache.path).load()['scancachepkg']
+    assert sorted(entry['modules']) == ['scancachepkg.app',
+                                        'scancachepkg.views']
+
+
+def test_scan_cache_warm_skips_unconfigured_modules(tmpdir, package_dir):
+    path = str(tmpdir.join('scan.json'))
+    cold = scan(ScanCache(path))
+    cold_actions = [(type(action), obj.__name__)
+                    for action, obj in cold.actions]
+    forget_modules()
+    warm = scan(ScanCache(path))
+    assert [(type(action), obj.__name__)
+            for action, obj in warm.actions] == cold_actions
+    assert warm.count == cold.count
+    assert len(warm.configurables) == 1
+    assert 'scancachepkg.views' in sys.modules
+    assert 'scancachepkg.plain' not in sys.modules
+    assert 'scancachepkg.sub' not in sys.modules
+    assert 'scancachepkg.sub.helpers' not in sys.modules
+
+
+def test_scan_cache_depends_on_ignore(tmpdir, package_dir):
+    import scancachepkg
+    cache = ScanCache(str(tmpdir.join('scan.json')))
+    config = Config(cache)
+    config.scan(scancachepkg, ignore=['.views'])
+    assert len(config.actions) == 0
+    forget_modules()
+    config = scan(ScanCache(cache.path))
+    assert len(config.actions) == 2
+
+
+def test_scan_cache_setup(tmpdir, package_dir):
+    path = str(tmpdir.join('scan.json'))
+    config = morepath.setup(ScanCache(path))
+    import scancachepkg
+    config.scan(scancachepkg)
+    forget_modules()
+    config = morepath.setup(ScanCache(path))
+    import scancachepkg
+    config.scan(scancachepkg)
+    config.commit()
+    c = Client(scancachepkg.app.app, Response)
+    assert c.get('/').data == 'root'
+    assert 'scancachepkg.plain' not in sys.modules
+
+
+def test_scan_cache_invalidated_by_change(tmpdir, package_dir):
+    path = str(tmpdir.join('scan.json'))
+    scan(ScanCache(path))
+    forget_modules()
+    package_dir.join('sub', 'helpers.py').write(
+        'from ..app import app\n'
+        'class Other(object):\n'
+        '    pass\n'
+        '@app.model(model=Other, path="other")\n'
+        'def get_other():\n'
+        '    return Other()\n')
+    config = scan(ScanCache(path))
+    assert len(config.actions) == 3
+    assert 'scancachepkg.sub.helpers' in ScanCache(path).load()[
+        'scancachepkg']['modules']
+
+
+def test_scan_cache_new_module(tmpdir, package_dir):
+    path = str(tmpdir.join('scan.json'))
+    scan(ScanCache(path))
+    forget_modules()
+    package_dir.join('more.py').write(
+        'from .app import app\n'
+        'class More(object):\n'
+        '    pass\n'
+        '@app.model(model=More, path="more")\n'
+        'def get_more():\n'
+        '    return More()\n')
+    config = scan(ScanCache(path))
+    assert len(config.actions) == 3
+
+
+def test_scan_cache_keeps_user_ignore(tmpdir, package_dir):
+    path = str(tmpdir.join('scan.json'))
+    scan(ScanCache(path))
+    forget_modules()
+    import scancachepkg
+    config = Config(ScanCache(path))
+    config.scan(scancachepkg, ignore=['.views'])
+    assert config.actions == []
+
+
+def test_scan_cache_corrupt_file(tmpdir, package_dir):
+    path = tmpdir.join('scan.json')
+    path.write('not json')
+    config = scan(ScanCache(str(path)))
+    assert len(config.actions) == 2
+
+
+def test_scan_cache_module(tmpdir):
+    config = Config(ScanCache(str(tmpdir.join('scan.json'))))
+    config.scan(basic)
+    assert len(config.actions) == len(scan_without_cache(basic).actions)
+    assert not os.path.exists(str(tmpdir.join('scan.json')))
+
+
+def scan_without_cache(package):
+    config = Config()
+    config.scan(package)
+    return config
@@ -4,11 +4,17 @@ from morepath.request import Response
 from werkzeug.test import Client
 from morepath import generic
 from morepath.security import (Identity, BasicAuthIdentityPolicy,
+                               PermissionCache, SignedTokenIdentityPolicy,
                                NO_IDENTITY)
 from .fixtures import identity_policy
 from werkzeug.datastructures import Headers
+from werkzeug.test import EnvironBuilder
 import base64
+import copy
 import json
+import pickle
+import pytest
+import time
 
 
 def test_no_permission():
@@ -302,3 +308,535 @@ def test_cookie_identity_policy():
 
     response = c.get('/foo')
     assert response.status == '401 UNAUTHORIZED'
+
+
+def setup_permission_cache_app(cache=None, cache_key=True):
+    app = morepath.App()
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    class Permission(object):
+        pass
+
+    checked = []
+
+    def get_permission(identity, model, permission):
+        checked.append(model.id)
+        return identity.userid == 'user' and model.id != 'forbidden'
+
+    def default(request, model):
+        return "Model: %s" % model.id
+
+    def nested(request, model):
+        permitted = [request.permits(model, Permission()) for i in range(3)]
+        return "Nested: %s" % permitted
+
+    class IdentityPolicy(object):
+        def identify(self, request):
+            return Identity(request.headers.get('X-User', 'anonymous'))
+
+        def remember(self, response, request, identity):
+            pass
+
+        def forget(self, response, request):
+            pass
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.model(path='{id}',
+                       variables=lambda model: {'id': model.id}),
+             Model)
+    c.action(app.permission(model=Model, permission=Permission),
+             get_permission)
+    c.action(app.view(model=Model, permission=Permission), default)
+    c.action(app.view(model=Model, name='nested', permission=Permission),
+             nested)
+    c.action(app.identity_policy(), IdentityPolicy)
+    if cache is not None:
+        c.action(app.permission_cache(), lambda: cache)
+    if cache_key:
+        c.action(app.function(generic.permission_key, Model),
+                 lambda model: model.id)
+    c.commit()
+    return app, checked
+
+
+def test_permission_memoized_per_request():
+    app, checked = setup_permission_cache_app()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo/nested', headers={'X-User': 'user'})
+    assert response.data == 'Nested: [True, True, True]'
+    assert checked == ['foo']
+    # no cache across requests
+    c.get('/foo', headers={'X-User': 'user'})
+    assert checked == ['foo', 'foo']
+
+
+def test_permission_cache():
+    cache = PermissionCache()
+    app, checked = setup_permission_cache_app(cache)
+
+    c = Client(app, Response)
+
+    response = c.get('/foo', headers={'X-User': 'user'})
+    assert response.data == 'Model: foo'
+    response = c.get('/foo', headers={'X-User': 'user'})
+    assert response.data == 'Model: foo'
+    assert checked == ['foo']
+    response = c.get('/foo', headers={'X-User': 'other'})
+    assert response.status == '401 UNAUTHORIZED'
+    response = c.get('/foo', headers={'X-User': 'other'})
+    assert response.status == '401 UNAUTHORIZED'
+    assert checked == ['foo', 'foo']
+    c.get('/bar', headers={'X-User': 'user'})
+    assert checked == ['foo', 'foo', 'bar']
+
+
+def test_permission_cache_invalidate():
+    cache = PermissionCache()
+    app, checked = setup_permission_cache_app(cache)
+
+    c = Client(app, Response)
+
+    c.get('/foo', headers={'X-User': 'user'})
+    c.get('/foo', headers={'X-User': 'other'})
+    assert checked == ['foo', 'foo']
+    cache.invalidate('user')
+    c.get('/foo', headers={'X-User': 'user'})
+    c.get('/foo', headers={'X-User': 'other'})
+    assert checked == ['foo', 'foo', 'foo']
+    cache.invalidate()
+    c.get('/foo', headers={'X-User': 'user'})
+    c.get('/foo', headers={'X-User': 'other'})
+    assert checked == ['foo', 'foo', 'foo', 'foo', 'foo']
+
+
+def test_permission_cache_timeout():
+    cache = PermissionCache(timeout=-1)
+    app, checked = setup_permission_cache_app(cache)
+
+    c = Client(app, Response)
+
+    c.get('/foo', headers={'X-User': 'user'})
+    c.get('/foo', headers={'X-User': 'user'})
+    assert checked == ['foo', 'foo']
+
+
+def test_permission_cache_key_identity():
+    cache = PermissionCache()
+
+    class Model(object):
+        pass
+
+    class Permission(object):
+        pass
+
+    model = Model()
+    verified = cache.key(Identity('user'), model, 1, Permission())
+    assert verified == cache.key(Identity('user'), model, 1, Permission())
+    assert verified != cache.key(Identity('user', password='secret'),
+                                 model, 1, Permission())
+    assert cache.key(Identity('user', roles=['admin']),
+                     model, 1, Permission()) is None
+
+
+def test_permission_cache_invalidations_pruned():
+    cache = PermissionCache(timeout=-1)
+    cache.invalidate('a')
+    cache.invalidate('b')
+    assert list(cache._generations) == ['b']
+    cache = PermissionCache()
+    cache.invalidate('a')
+    cache.invalidate('b')
+    cache.invalidate('a')
+    assert list(cache._generations) == ['b', 'a']
+
+
+def test_permission_cache_without_key():
+    cache = PermissionCache()
+    app, checked = setup_permission_cache_app(cache, cache_key=False)
+
+    c = Client(app, Response)
+
+    c.get('/foo', headers={'X-User': 'user'})
+    c.get('/foo', headers={'X-User': 'user'})
+    assert checked == ['foo', 'foo']
+
+
+def setup_filter_permitted_app(batch=False, check_first=False,
+                               cache=None):
+    app = morepath.App()
+
+    class Root(object):
+        pass
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    class Other(Model):
+        pass
+
+    class Permission(object):
+        pass
+
+    calls = []
+
+    def get_permission(identity, model, permission):
+        calls.append(model.id)
+        return model.id % 2 == 0
+
+    def get_permission_batch(identity, models, permission):
+        calls.append([model.id for model in models])
+        return [model.id % 2 == 0 for model in models]
+
+    if batch:
+        get_permission.batch = get_permission_batch
+
+    def get_other_permission(identity, model, permission):
+        return True
+
+    def default(request, model):
+        models = [Model(0), Other(1), Model(1), Model(2), Other(2)]
+        if check_first:
+            request.permits(models[0], Permission())
+        result = ','.join(
+            ['%s%s' % (model.__class__.__name__, model.id) for model in
+             request.filter_permitted(models, Permission())])
+        if check_first:
+            request.permits(models[3], Permission())
+        return result
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.root(), Root)
+    c.action(app.permission(model=Model, permission=Permission,
+                            identity=None),
+             get_permission)
+    c.action(app.permission(model=Other, permission=Permission,
+                            identity=None),
+             get_other_permission)
+    c.action(app.view(model=Root), default)
+    if cache is not None:
+        c.action(app.permission_cache(), lambda: cache)
+        c.action(app.function(generic.permission_key, Model),
+                 lambda model: model.id)
+    c.commit()
+    return app, calls
+
+
+def test_filter_permitted():
+    app, calls = setup_filter_permitted_app()
+
+    c = Client(app, Response)
+
+    response = c.get('/')
+    assert response.data == 'Model0,Other1,Model2,Other2'
+    assert calls == [0, 1, 2]
+
+
+def test_filter_permitted_batch():
+    app, calls = setup_filter_permitted_app(batch=True)
+
+    c = Client(app, Response)
+
+    response = c.get('/')
+    assert response.data == 'Model0,Other1,Model2,Other2'
+    assert calls == [[0, 1, 2]]
+
+
+def test_filter_permitted_memoized():
+    app, calls = setup_filter_permitted_app(check_first=True)
+
+    c = Client(app, Response)
+
+    response = c.get('/')
+    assert response.data == 'Model0,Other1,Model2,Other2'
+    assert calls == [0, 1, 2]
+
+
+def test_filter_permitted_batch_memoized():
+    app, calls = setup_filter_permitted_app(batch=True, check_first=True)
+
+    c = Client(app, Response)
+
+    response = c.get('/')
+    assert response.data == 'Model0,Other1,Model2,Other2'
+    assert calls == [0, [1, 2]]
+
+
+def test_filter_permitted_cache():
+    app, calls = setup_filter_permitted_app(cache=PermissionCache())
+
+    c = Client(app, Response)
+
+    response = c.get('/')
+    assert response.data == 'Model0,Other1,Model2,Other2'
+    response = c.get('/')
+    assert response.data == 'Model0,Other1,Model2,Other2'
+    assert calls == [0, 1, 2]
+
+
+def test_filter_permitted_cache_lookups():
+    app = morepath.App()
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    class Permission(object):
+        pass
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.permission(model=Model, permission=Permission,
+                            identity=None),
+             lambda identity, model, permission: True)
+    c.action(app.permission_cache(), PermissionCache)
+    c.action(app.function(generic.permission_key, Model),
+             lambda model: model.id)
+    c.commit()
+
+    class CountingLookup(object):
+        def __init__(self, lookup):
+            self.lookup = lookup
+            self.components = []
+
+        def component(self, key, args, *rest, **kw):
+            self.components.append(key)
+            return self.lookup.component(key, args, *rest, **kw)
+
+        def __getattr__(self, name):
+            return getattr(self.lookup, name)
+
+    request = app.request(EnvironBuilder('/').get_environ())
+    request.identity = NO_IDENTITY
+    request.lookup = lookup = CountingLookup(request.lookup)
+    models = [Model(i) for i in range(10)]
+    assert list(request.filter_permitted(models, Permission())) == models
+    # the cache and the key function are looked up once for all models
+    assert lookup.components.count('permission_cache') == 1
+    assert lookup.components.count(generic.permission_key) == 1
+
+
+def test_signed_token_identity_policy():
+    app = morepath.App()
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    def get_permission(identity, model, permission):
+        return identity.userid == 'user'
+
+    def default(request, model):
+        return "Model: %s %s" % (model.id, request.identity.payload)
+
+    def log_in(request, model):
+        response = Response()
+        generic.remember(response, request, Identity(userid='user',
+                                                     payload='Amazing'),
+                         lookup=request.lookup)
+        return response
+
+    def log_out(request, model):
+        response = Response()
+        generic.forget(response, request, lookup=request.lookup)
+        return response
+
+    class Permission(object):
+        pass
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.model(path='{id}',
+                       variables=lambda model: {'id': model.id}),
+             Model)
+    c.action(app.permission(model=Model, permission=Permission),
+             get_permission)
+    c.action(app.view(model=Model, permission=Permission),
+             default)
+    c.action(app.view(model=Model, name='log_in'),
+             log_in)
+    c.action(app.view(model=Model, name='log_out'),
+             log_out)
+    c.action(app.identity_policy(),
+             lambda: SignedTokenIdentityPolicy('secret'))
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo')
+    assert response.status == '401 UNAUTHORIZED'
+
+    response = c.get('/foo/log_in')
+    assert 'morepath_token=' in response.headers['Set-Cookie']
+
+    response = c.get('/foo')
+    assert response.status == '200 OK'
+    assert response.data == 'Model: foo Amazing'
+
+    response = c.get('/foo/log_out')
+
+    response = c.get('/foo')
+    assert response.status == '401 UNAUTHORIZED'
+
+
+def test_signed_token_bearer():
+    policy = SignedTokenIdentityPolicy('secret')
+    token = policy.create_token(Identity('user', payload='Amazing'))
+    app = morepath.App()
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    def default(request, model):
+        return "Model: %s %s" % (model.id, request.identity.userid)
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.model(path='{id}',
+                       variables=lambda model: {'id': model.id}),
+             Model)
+    c.action(app.view(model=Model), default)
+    c.action(app.identity_policy(), lambda: policy)
+    c.commit()
+
+    c = Client(app, Response)
+
+    response = c.get('/foo', headers={'Authorization': 'Bearer ' + token})
+    assert response.data == 'Model: foo user'
+    response = c.get('/foo', headers={'Authorization': 'Bearer wrong'})
+    assert response.data == 'Model: foo None'
+
+
+def test_signed_token_verify():
+    policy = SignedTokenIdentityPolicy('secret')
+    token = policy.create_token(Identity('user', payload='Amazing'))
+    identity = policy.verify_token(token)
+    assert identity.as_dict() == {'userid': 'user', 'payload': 'Amazing'}
+    # verified token is cached
+    assert policy.verify_token(token) is identity
+    assert policy.cache.hits == 1
+
+    data, signature = token.split('.')
+    other = SignedTokenIdentityPolicy('other')
+    assert other.verify_token(token) is None
+    forged = base64.urlsafe_b64encode(json.dumps(
+        {'userid': 'admin', 'expires': time.time() + 100}))
+    assert policy.verify_token(forged + '.' + signature) is None
+    assert policy.verify_token('garbage') is None
+    assert policy.verify_token(u'\xfc.\xfc') is None
+
+
+def test_signed_token_expired():
+    policy = SignedTokenIdentityPolicy('secret', max_age=-1)
+    token = policy.create_token(Identity('user'))
+    assert policy.verify_token(token) is None
+    # an expired token is not served from the cache either
+    policy.cache.put(token, (Identity('user'), time.time() - 1))
+    assert policy.verify_token(token) is None
+    assert policy.cache.get(token) is None
+
+
+def test_basic_auth_identity_policy_verify():
+    app = morepath.App()
+
+    class Model(object):
+        def __init__(self, id):
+            self.id = id
+
+    verified = []
+
+    def verify(username, password):
+        verified.append(username)
+        return username == 'user' and password == 'secret'
+
+    def default(request, model):
+        return "Model: %s %s" % (model.id, request.identity.userid)
+
+    policy = BasicAuthIdentityPolicy(verify=verify)
+
+    c = setup()
+    c.configurable(app)
+    c.action(app.model(path='{id}',
+                       variables=lambda model: {'id': model.id}),
+             Model)
+    c.action(app.view(model=Model), default)
+    c.action(app.identity_policy(), lambda: policy)
+    c.commit()
+
+    c = Client(app, Response)
+
+    headers = Headers()
+    headers.add('Authorization', 'Basic ' + base64.b64encode('user:secret'))
+    response = c.get('/foo', headers=headers)
+    assert response.data == 'Model: foo user'
+    response = c.get('/foo', headers=headers)
+    assert response.data == 'Model: foo user'
+    assert verified == ['user']
+    assert policy.cache.hits == 1
+    assert policy.cache.misses == 1
+
+    headers = Headers()
+    headers.add('Authorization', 'Basic ' + base64.b64encode('user:wrong'))
+    response = c.get('/foo', headers=headers)
+    assert response.data == 'Model: foo None'
+    response = c.get('/foo', headers=headers)
+    assert response.data == 'Model: foo None'
+    assert verified == ['user', 'user', 'user']
+
+
+def test_basic_auth_verified_identity_has_no_password():
+    policy = BasicAuthIdentityPolicy(verify=lambda username, password: True)
+    request = morepath.Request.from_values(headers={
+        'Authorization': 'Basic ' + base64.b64encode('user:secret')})
+    identity = policy.identify(request)
+    assert identity.as_dict() == {'userid': 'user'}
+
+
+def test_identity():
+    identity = Identity('user', payload='Amazing')
+    assert identity.userid == 'user'
+    assert identity.payload == 'Amazing'
+    assert identity.as_dict() == {'userid': 'user', 'payload': 'Amazing'}
+    with pytest.raises(AttributeError):
+        identity.unknown
+    with pytest.raises(AttributeError):
+        identity.userid = 'other'
+    with pytest.raises(AttributeError):
+        identity.extra = 'extra'
+    with pytest.raises(AttributeError):
+        del identity.payload
+
+
+def test_identity_hashable():
+    identity = Identity('user', payload='Amazing')
+    same = Identity('user', payload='Amazing')
+    other = Identity('user', payload='Other')
+    assert identity == same
+    assert not identity != same
+    assert identity != other
+    assert identity != Identity('other', payload='Amazing')
+    assert identity != NO_IDENTITY
+    assert hash(identity) == hash(same)
+    assert len(set([identity, same, other])) == 2
+
+
+def test_identity_unhashable_information():
+    identity = Identity('user', groups=['a', 'b'])
+    assert identity.groups == ['a', 'b']
+    with pytest.raises(TypeError):
+        hash(identity)
+
+
+def test_identity_copy_and_pickle():
+    identity = Identity('user', payload='Amazing')
+    assert copy.copy(identity) == identity
+    assert pickle.loads(pickle.dumps(identity)) == identity
+    assert pickle.loads(pickle.dumps(identity, 2)) == identity
@@ -0,0 +1,121 @@
+import httplib
+import os
+import signal
+import threading
+import time
+import urllib2
+
+import morepath
+from morepath.error import ConfigError
+from morepath.server import PreforkServer, WSGIRequestHandler
+import pytest
+
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'),
+                                reason="requires os.fork")
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def app(environ, start_response):
+    if environ['PATH_INFO'] == '/crash':
+        os._exit(1)
+    if environ['PATH_INFO'] == '/slow':
+        time.sleep(0.5)
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid())]
+
+
+def get(server, path):
+    # retry while workers start or are being replaced
+    for i in range(50):
+        try:
+            return urllib2.urlopen(
+                'http://127.0.0.1:%s%s' % (server.port, path),
+                timeout=5).read()
+        except (urllib2.URLError, IOError):
+            time.sleep(0.1)
+    raise AssertionError("server did not respond")
+
+
+def serving(server, amount):
+    # a worker handles one request at a time, so concurrent slow
+    # requests are handled by different workers
+    result = []
+    threads = [threading.Thread(target=lambda: result.append(
+        get(server, '/slow'))) for i in range(amount)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return set(result)
+
+
+def start(server):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            server.serve_forever()
+        except:
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def test_prefork_server():
+    server = PreforkServer(app, port=0, workers=2, poll_interval=0.1,
+                           handler_class=QuietHandler)
+    pid = start(server)
+    try:
+        worker = get(server, '/')
+        assert worker != str(pid)
+        workers = serving(server, 2)
+        assert len(workers) == 2
+        assert str(pid) not in workers
+        with pytest.raises((IOError, httplib.HTTPException)):
+            urllib2.urlopen('http://127.0.0.1:%s/crash' % server.port,
+                            timeout=5).read()
+        # the crashed worker is replaced by a new one
+        for i in range(20):
+            replaced = serving(server, 2) - workers
+            if replaced:
+                break
+        assert replaced
+        assert str(pid) not in replaced
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        waited, status = os.waitpid(pid, 0)
+        server.server.server_close()
+    assert os.WIFEXITED(status)
+    assert os.WEXITSTATUS(status) == 0
+
+
+def test_run_workers_uncommitted():
+    app = morepath.App()
+    with pytest.raises(ConfigError):
+        app.run(workers=2)
+
+
+def test_run_workers_freezes(monkeypatch):
+    frozen = []
+
+    class Server(object):
+        def __init__(self, app, host, port, workers, **options):
+            self.app = app
+
+        def serve_forever(self):
+            frozen.append(self.app.frozen)
+
+    monkeypatch.setattr(morepath.app, 'PreforkServer', Server)
+    app = morepath.App()
+    c = morepath.setup()
+    c.configurable(app)
+    c.commit()
+    assert not app.frozen
+    app.run(workers=2)
+    assert frozen == [True]
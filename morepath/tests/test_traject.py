@@ -239,6 +239,70 @@ def test_traject_simple():
     assert traject(['b', 'a']) == (None, [], {})
 
 
+def test_traject_layers():
+    base = Traject()
+    base.add_pattern('a/b', 'ab')
+    base.add_pattern('a/{x}', 'ax')
+    base.add_pattern('c/d', 'base cd')
+    traject = Traject([base])
+    traject.add_pattern('a/c', 'ac')
+    traject.add_pattern('a/{x}/e', 'axe')
+    traject.add_pattern('c/d', 'cd')
+
+    assert traject(['b', 'a']) == ('ab', [], {})
+    assert traject(['c', 'a']) == ('ac', [], {})
+    assert traject(['f', 'a']) == ('ax', [], {'x': 'f'})
+    assert traject(['e', 'f', 'a']) == ('axe', [], {'x': 'f'})
+    assert traject(['d', 'c']) == ('cd', [], {})
+    assert traject(['+view', 'b', 'a']) == ('ab', ['+view'], {})
+    assert traject(['z']) == (None, ['z'], {})
+    assert base(['c', 'a']) == ('ax', [], {'x': 'c'})
+
+
+def test_traject_layers_path():
+    class SubModel(Model):
+        pass
+
+    base = Traject()
+    base.inverse(Model, 'models/{id}', lambda model: {'id': 'base'})
+    traject = Traject([base])
+    assert traject.path(Model()) == 'models/base'
+    assert traject.path(SubModel()) == 'models/base'
+    traject.inverse(SubModel, 'sub/{id}', lambda model: {'id': 'sub'})
+    assert traject.path(Model()) == 'models/base'
+    assert traject.path(SubModel()) == 'sub/sub'
+    with pytest.raises(LookupError):
+        traject.path(Root())
+
+
+def test_traject_flatten():
+    class SubModel(Model):
+        pass
+
+    base = Traject()
+    base.add_pattern('a/b', 'ab')
+    base.add_pattern('a/{x}', 'ax')
+    base.add_pattern('c/d', 'base cd')
+    base.inverse(Model, 'models/{id}', lambda model: {'id': 'base'})
+    traject = Traject([base])
+    traject.add_pattern('a/c', 'ac')
+    traject.add_pattern('a/{x}/e', 'axe')
+    traject.add_pattern('c/d', 'cd')
+    traject.inverse(SubModel, 'sub/{id}', lambda model: {'id': 'sub'})
+
+    flat = traject.flatten()
+    assert flat.layers == []
+    assert flat(['b', 'a']) == ('ab', [], {})
+    assert flat(['c', 'a']) == ('ac', [], {})
+    assert flat(['f', 'a']) == ('ax', [], {'x': 'f'})
+    assert flat(['e', 'f', 'a']) == ('axe', [], {'x': 'f'})
+    assert flat(['d', 'c']) == ('cd', [], {})
+    assert flat(['z']) == (None, ['z'], {})
+    assert flat.path(Model()) == 'models/base'
+    assert flat.path(SubModel()) == 'sub/sub'
+    assert base.flatten() is base
+
+
 def test_traject_variable_specific_first():
     traject = Traject()
     traject.add_pattern('a/{x}/b', 'axb')
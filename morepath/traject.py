@@ -1,6 +1,6 @@
 import re
 from functools import total_ordering
-from reg import Registry
+from reg import Registry, ComponentLookupError
 
 
 IDENTIFIER = re.compile(r'^[^\d\W]\w*$')
@@ -171,7 +171,12 @@ class Path(object):
 
 
 class Traject(Node):
-    def __init__(self):
+    def __init__(self, layers=None):
+        """
+        :param layers: list of :class:`Traject` objects to fall back
+          on, in order, for paths and models not registered in this
+          one. Optional.
+        """
         super(Traject, self).__init__()
         # XXX caching is not enabled
         # also could this really be registering things in the main
@@ -179,6 +184,27 @@ class Traject(Node):
         # for that this would get it automatically. but this would
         # require each traject base to have its own lookup
         self._inverse = Registry()
+        if layers is None:
+            layers = []
+        self.layers = layers
+
+    def is_empty(self):
+        return (not self._name_nodes and not self._variable_nodes and
+                self.value is None and not self._inverse.registry._d)
+
+    def trajects(self):
+        """This traject followed by its non-empty layers, depth first.
+        """
+        result = []
+        todo = [self]
+        while todo:
+            traject = todo.pop()
+            if traject in result:
+                continue
+            if traject is self or not traject.is_empty():
+                result.append(traject)
+            todo.extend(reversed(traject.layers))
+        return result
 
     def add_pattern(self, path, value):
         node = self
@@ -199,7 +225,31 @@ class Traject(Node):
                                [model_class],
                                (path.interpolation_str(), get_variables))
 
+    def flatten(self):
+        """Traject combining this traject with its layers.
+
+        Used to avoid consulting layers one by one for each path.
+
+        :returns: a new :class:`Traject` without layers, or this
+          traject if it has no non-empty layers.
+        """
+        trajects = self.trajects()
+        if len(trajects) == 1:
+            return self
+        result = Traject()
+        for traject in reversed(trajects):
+            merge_node(result, traject)
+            inverse = traject._inverse.registry._d.get('inverse')
+            if inverse is None:
+                continue
+            for key, value in inverse._by_arity.get(1, {}).items():
+                result._inverse.register('inverse', [key.key], value)
+        return result
+
     def __call__(self, stack):
+        trajects = self.trajects()
+        if len(trajects) > 1:
+            return consume_layered(trajects, stack)
         stack = stack[:]
         node = self
         variables = {}
@@ -217,12 +267,81 @@ class Traject(Node):
         return node.value, stack, variables
 
     def path(self, model):
-        path, get_variables = self._inverse.component('inverse', [model])
+        trajects = self.trajects()
+        if len(trajects) > 1:
+            path, get_variables = inverse_layered(trajects, model)
+        else:
+            path, get_variables = self._inverse.component('inverse',
+                                                          [model])
         variables = get_variables(model)
         assert isinstance(variables, dict)
         return path % variables
 
 
+def merge_node(target, source):
+    if source.value is not None:
+        target.value = source.value
+    for node in source._name_nodes.values():
+        merge_node(target.add_name_node(node.step), node)
+    for node in source._variable_nodes:
+        merge_node(target.add_variable_node(node.step), node)
+
+
+def consume_layered(nodes, stack):
+    """Consume stack using the nodes of layered trajects.
+
+    Name steps match before variable steps, in any layer; the first
+    layer that has a value for the path found provides it.
+    """
+    stack = stack[:]
+    variables = {}
+    while stack:
+        segment = stack.pop()
+        if segment.startswith(VIEW_PREFIX):
+            stack.append(segment)
+            return layered_value(nodes), stack, variables
+        new_nodes, new_variables = get_layered(nodes, segment)
+        if not new_nodes:
+            stack.append(segment)
+            return layered_value(nodes), stack, variables
+        nodes = new_nodes
+        variables.update(new_variables)
+    return layered_value(nodes), stack, variables
+
+
+def get_layered(nodes, segment):
+    found = [node._name_nodes[segment] for node in nodes
+             if segment in node._name_nodes]
+    if found:
+        return found, {}
+    candidates = sorted([variable_node for node in nodes
+                         for variable_node in node._variable_nodes],
+                        key=lambda node: node.step)
+    for candidate in candidates:
+        matched, variables = candidate.match(segment)
+        if matched:
+            return [node for node in candidates
+                    if node.step.s == candidate.step.s], variables
+    return [], {}
+
+
+def layered_value(nodes):
+    for node in nodes:
+        if node.value is not None:
+            return node.value
+    return None
+
+
+def inverse_layered(trajects, model):
+    for class_ in model.__class__.__mro__:
+        for traject in trajects:
+            result = traject._inverse.exact('inverse', [class_])
+            if result is not None:
+                return result
+    raise ComponentLookupError(
+        "%r: no component found for args %r" % ('inverse', [model]))
+
+
 class NameParser(object):
     def __init__(self, known_converters):
         self.known_converters = known_converters
@@ -1,34 +1,129 @@
 from morepath import generic
 from .request import Request, Response
 from reg import PredicateMatcher, Predicate
+from reg.predicate import PredicateRegistry, ANY
+from repoze.lru import LRUCache
+from werkzeug.http import parse_accept_header
+from werkzeug.datastructures import MIMEAccept
 import json
 
 
+CONTENT_TYPES = ['text/html', 'application/json']
+
+
+# there are only a few distinct Accept headers in practice, so we
+# cache the content type negotiated for each of them
+_content_type_cache = LRUCache(1000)
+
+
+class NotCalculated(object):
+    pass
+
+
+NOT_CALCULATED = NotCalculated()
+
+
 class View(object):
-    def __init__(self, func, render, permission):
+    def __init__(self, func, render, permission, cacheable=False):
         self.func = func
         self.render = render
         self.permission = permission
+        self.cacheable = cacheable
 
     def __call__(self, request, model):
         return self.func(request, model)
 
 
+class ViewMatcher(PredicateMatcher):
+    """Predicate matcher that calculates predicates lazily.
+
+    Predicates are calculated in order, and only if the views that are
+    still candidates after the earlier predicates depend on them. A
+    calculated value is memoized on the request.
+    """
+    def __init__(self, predicates):
+        super(ViewMatcher, self).__init__(predicates)
+        self.registrations = {}
+
+    def register(self, predicates, value):
+        key = tuple(sorted(predicates.items()))
+        if key in self.registrations:
+            # a view of an extended app is overridden; start over, as
+            # the predicate registry cannot forget a registration
+            self.reg = PredicateRegistry(self._predicates)
+            self.registrations[key] = predicates, value
+            for predicates, value in self.registrations.values():
+                self.reg.register(predicates, value)
+            return
+        self.registrations[key] = predicates, value
+        self.reg.register(predicates, value)
+
+    def predicates(self, request, model):
+        return dict.fromkeys(self.defaults, NOT_CALCULATED)
+
+    def __call__(self, request, model, **kw):
+        # predicates from another matcher, for instance that of an
+        # extended app, may lack some of ours; calculate those too
+        lazy = any(value is NOT_CALCULATED for value in kw.values())
+        key = {}
+        candidates = None
+        for predicate in self._predicates:
+            name = predicate.name
+            index = self.reg.indexes[name]
+            any_matches = index.get(ANY)
+            value = kw.get(name,
+                           NOT_CALCULATED if lazy else predicate.default)
+            if value is NOT_CALCULATED:
+                if candidates is not None and candidates <= any_matches:
+                    value = ANY
+                else:
+                    value = calc_predicate(request, predicate, model)
+            key[name] = value
+            matches = index.get(value) | any_matches
+            if candidates is None:
+                candidates = matches
+            else:
+                candidates = candidates & matches
+            if not candidates:
+                return None
+        return self.reg.get(key)
+
+
+def calc_predicate(request, predicate, model):
+    cache_key = (predicate.name, id(model))
+    cached = request._predicate_values.get(cache_key)
+    if cached is not None and cached[0] is model:
+        return cached[1]
+    value = predicate.calc(request, model)
+    request._predicate_values[cache_key] = model, value
+    return value
+
+
 # XXX what happens if predicates is None for one registration
 # but filled for another?
 def register_view(registry, model, view, render=None, permission=None,
-                  predicates=None):
+                  predicates=None, cacheable=False):
     if permission is not None:
         # instantiate permission class so it can be looked up using reg
         permission = permission()
-    registration = View(view, render, permission)
+    registration = View(view, render, permission, cacheable)
     if predicates is not None:
         matcher = registry.exact(generic.view, (Request, model))
         if matcher is None:
-            predicate_info = registry.exact('predicate_info', ())
-            predicate_info.sort()
-            matcher = PredicateMatcher(
+            # sort stably, so predicates of the same order are
+            # checked in the order they were registered
+            predicate_info = sorted(registry.get('predicate_info', ()),
+                                    key=lambda info: info[0])
+            matcher = ViewMatcher(
                 [predicate for (order, predicate) in predicate_info])
+            # the views of extended apps for this model take part in
+            # matching, as if they were registered here
+            for extended in reversed(registry.registries()[1:]):
+                extended_matcher = extended.exact(generic.view,
+                                                  (Request, model))
+                if isinstance(extended_matcher, ViewMatcher):
+                    for args in extended_matcher.registrations.values():
+                        matcher.register(*args)
         matcher.register(predicates, registration)
         registration = matcher
     registry.register(generic.view, (Request, model), registration)
@@ -37,7 +132,8 @@ def register_view(registry, model, view, render=None, permission=None,
 def register_predicate(registry, name, order, default, index, calc):
     predicate_info = registry.exact('predicate_info', ())
     if predicate_info is None:
-        predicate_info = []
+        # copy the predicates of any extended registry
+        predicate_info = list(registry.get('predicate_info', ()) or [])
         registry.register('predicate_info', (), predicate_info)
     predicate_info.append((order, Predicate(name, index, calc, default)))
 
@@ -52,3 +148,57 @@ def render_html(content):
     response = Response(content)
     response.content_type = 'text/html'
     return response
+
+
+def negotiate_content_type(accept):
+    """Negotiate content type for an ``Accept`` header.
+
+    :param accept: the value of the ``Accept`` header, or ``None``.
+    :returns: the best matching type in ``CONTENT_TYPES``, or ``None``
+      if none of them are acceptable.
+    """
+    if not accept:
+        return CONTENT_TYPES[0]
+    result = _content_type_cache.get(accept, NOT_CALCULATED)
+    if result is not NOT_CALCULATED:
+        return result
+    parsed = parse_accept_header(accept, MIMEAccept)
+    result = None
+    best_quality = 0
+    for content_type in CONTENT_TYPES:
+        quality = accept_quality(parsed, content_type)
+        if quality > best_quality:
+            result = content_type
+            best_quality = quality
+    _content_type_cache.put(accept, result)
+    return result
+
+
+def accept_quality(accept, value):
+    """Quality with which an ``Accept`` style header accepts value.
+
+    The most specific matching entry counts: an entry for value itself
+    takes precedence over ``type/*``, which takes precedence over
+    ``*/*`` and ``*``. A quality of 0 means that value is refused.
+
+    :param accept: a parsed header, as returned by
+      :func:`werkzeug.http.parse_accept_header`.
+    :param value: the value to get the quality for, in lower case.
+    :returns: the quality, 0 if value is not acceptable.
+    """
+    result = 0
+    specificity = -1
+    for entry, quality in accept:
+        entry = entry.lower()
+        if entry == value:
+            return quality
+        if entry.endswith('/*') and value.startswith(entry[:-1]):
+            entry_specificity = 1
+        elif entry in ('*', '*/*'):
+            entry_specificity = 0
+        else:
+            continue
+        if entry_specificity > specificity:
+            result = quality
+            specificity = entry_specificity
+    return result
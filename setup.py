@@ -15,7 +15,13 @@ setup(name='morepath',
         'venusian',
         'reg',
         'werkzeug',
+        'repoze.lru',
         ],
+      entry_points={
+        'console_scripts': [
+            'morepath-commit-report = morepath.report:main',
+            ],
+        },
       extras_require = dict(
         test=['pytest >= 2.0',
               'pytest-cov'],